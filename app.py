@@ -1,54 +1,98 @@
 # --- Imports ---
+# openai, markdown2 and the PDF/Word extractors load on first use (see
+# ghostwriter_preload), so a session that only pastes text never pays for them
+import time
+SCRIPT_STARTED = time.perf_counter()
 import os
 import json
-import uuid
-import tempfile
-import subprocess
 from datetime import datetime
 
 import streamlit as st
-import openai
-import markdown2
-import fitz  # PyMuPDF
-import docx  # python-docx for .docx handling
 from dotenv import load_dotenv
-from ghostwriter_doc_learning import Workspace
-
-# --- Initialize Workspace ---
-workspace = Workspace()
+from ghostwriter_doc_learning import DuplicateDocumentError
+from ghostwriter_export import PdfExporter, content_hash, export_jsonl
+from ghostwriter_extract import content_key, extract_text, iter_text, join_parts
+from ghostwriter_bulk_review import BulkReport, ReviewSource, library_documents, review_sources
+from ghostwriter_cache import ResponseCache, cache_key
+from ghostwriter_generation import (
+    AUDIENCES, CONTEXT_TOKEN_BUDGET, DOC_TYPES, MODEL, TEMPERATURE, GenerationStats, build_messages, estimate_tokens,
+)
+from ghostwriter_jobs import REQUESTS_PER_MINUTE, JobQueue
+from ghostwriter_library import find_duplicates, new_document, save_document
+from ghostwriter_metrics import REGISTRY, span, start_exporter
+from ghostwriter_preload import preload
+from ghostwriter_review import CATEGORIES, ReviewSummary, SnapshotReviewer
+from ghostwriter_sections import build_section_messages, parse_rewrites, parse_sections, splice_sections
+from ghostwriter_style import STYLE_TOKEN_BUDGET, select_style_rules
+from ghostwriter_storage import CachedFile
+from ghostwriter_tenants import TenantRegistry
 
 # --- Load OpenAI API Key ---
-openai.api_key = st.secrets["OPENAI_API_KEY"]
+OPENAI_API_KEY = st.secrets["OPENAI_API_KEY"]
 
 # --- Page Settings ---
 st.set_page_config(page_title="Ghostwriter", layout="wide")
 
+# --- Initialize Workspace ---
+# One Workspace per tenant, shared by that tenant's sessions behind a
+# reader/writer lock and restored from its last snapshot. The tenant comes
+# from the ?tenant= URL parameter (or GHOSTWRITER_TENANT).
+@st.cache_resource
+def get_tenants() -> TenantRegistry:
+    return TenantRegistry()
+
+tenant = get_tenants().get(st.query_params.get("tenant", os.getenv("GHOSTWRITER_TENANT")))
+
+# --- Response Cache ---
+# Identical generation requests (model, prompts, temperature) reuse the stored draft
+@st.cache_resource
+def get_response_cache() -> ResponseCache:
+    return ResponseCache()
+
+REVIEW_REFRESH_SECONDS = 0.25
+JOB_POLL_SECONDS = 0.5
+PDF_POLL_SECONDS = 2
+EXTRACT_PROGRESS_EVERY = 10
+EXEMPLAR_COUNT = 3
+
+# Optional OpenAI-compatible endpoint (e.g. tools/fake_openai_server.py)
+OPENAI_BASE_URL = st.secrets.get("OPENAI_BASE_URL", os.getenv("OPENAI_BASE_URL"))
+
+# --- Metrics Export ---
+# Optional file for scrapers: Prometheus text if it ends in .prom, otherwise JSON
+METRICS_FILE = st.secrets.get("GHOSTWRITER_METRICS_FILE", os.getenv("GHOSTWRITER_METRICS_FILE"))
+
+@st.cache_resource
+def get_metrics_exporter(path: str):
+    return start_exporter(path)
+
+if METRICS_FILE:
+    get_metrics_exporter(METRICS_FILE)
+
+# --- Background Preload ---
+# Optional: import the heavy modules on a background thread once per process,
+# so the first generation or PDF upload doesn't wait for them
+@st.cache_resource
+def start_preload():
+    return preload()
+
+if str(st.secrets.get("GHOSTWRITER_PRELOAD", os.getenv("GHOSTWRITER_PRELOAD", ""))).lower() in ("1", "true", "yes"):
+    start_preload()
+
+# --- Static Assets ---
+CSS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "ghostwriter.css")
+
+@st.cache_resource
+def get_css_file() -> CachedFile:
+    return CachedFile(CSS_PATH)
+
+def load_css() -> str:
+    css = get_css_file().read()
+    return css[0] if css else ""
+
 # --- Global Custom Styling ---
-st.markdown("""
-<style>
-body, .stApp { background-color: #f7f9fa; color: #333; font-family: 'Helvetica Neue', sans-serif; }
-h1, h2, h3, .big-title {
-    font-size: 48px;
-    font-weight: 700;
-    margin-top: 1rem;
-    margin-bottom: 0.5rem;
-    color: #2C3E50;
-}
-.stButton>button { background-color: #5D737E; color: white; border-radius: 8px; padding: 8px 16px; border: none; transition: background-color 0.3s ease; }
-.stButton>button:hover { background-color: #4C5B68; }
-.section-card { background: #ffffff; border-radius: 10px; box-shadow: 0 2px 8px rgba(0,0,0,0.05); padding: 2rem; margin-bottom: 2rem; }
-.sidebar .sidebar-content { background-color: #f0f2f4; }
-.stAlert {
-    background-color: #e6f4ea !important;
-    color: #2c662d !important;
-    border-left: 5px solid #34a853 !important;
-    border-radius: 8px;
-    padding: 1rem;
-    margin-top: 1.5rem;
-    box-shadow: 0 2px 6px rgba(0, 0, 0, 0.1);
-}
-</style>
-""", unsafe_allow_html=True)
+# Read once per process (and again only if the file changes), sent in one block
+st.markdown(f"<style>{load_css()}</style>", unsafe_allow_html=True)
 
 
 
@@ -72,8 +116,15 @@ with st.sidebar:
     st.caption("Configure your document")
 
     # Document Setup
-    st.selectbox("📂 Document Type", ["Quick Start", "Install Guide", "Safety Sheet", "FAQ"], key="doc_type")
-    st.selectbox("👥 Audience", ["End User", "Technician", "Support Staff"], key="audience")
+    st.selectbox("📂 Document Type", DOC_TYPES, key="doc_type")
+    st.selectbox("👥 Audience", AUDIENCES, key="audience")
+    st.toggle("⚡ Stream draft as it is written", value=True, key="stream_generation")
+    st.checkbox("♻️ Bypass response cache", key="bypass_cache")
+    st.checkbox("🧠 Use learned documents as style exemplars", value=True, key="use_exemplars")
+    st.number_input(
+        "📘 Style guide token budget", min_value=0, value=STYLE_TOKEN_BUDGET, step=50, key="style_token_budget",
+        help="Only the most relevant style guide rules are sent, up to this many tokens. 0 sends the whole guide.",
+    )
 
     st.markdown('<div class="sidebar-divider"></div>', unsafe_allow_html=True)
 
@@ -94,74 +145,88 @@ with st.sidebar:
     with st.expander("Learn from Existing Documents"):
         learn_file = st.file_uploader("Upload a document to train Ghostwriter", type=["txt", "md", "docx"], key="learn_upload")
         learn_status = st.selectbox("Document Status", ["draft", "final"], key="learn_status")
+        allow_duplicates = st.checkbox("Allow near-duplicates", key="learn_allow_duplicates",
+                                       help="Near-copies skew the learned term frequencies.")
         if learn_file and st.button("Upload for Learning", key="learn_button"):
-            ext = learn_file.name.split('.')[-1].lower()
-            if ext == "docx":
-                doc = docx.Document(learn_file)
-                learn_text = "\n".join(p.text for p in doc.paragraphs)
-            else:
-                learn_text = learn_file.read().decode("utf-8")
-            workspace.upload_document(learn_text, learn_file.name, learn_status)
-            st.success(f"✅ {learn_file.name} uploaded and tagged as {learn_status}.")
+            with span("extract", source="learn"):
+                learn_text = extract_text(learn_file.name, learn_file.getvalue())
+            try:
+                tenant.update(lambda ws: ws.upload_document(learn_text, learn_file.name, learn_status, allow_duplicates))
+                st.success(f"✅ {learn_file.name} uploaded and tagged as {learn_status}.")
+            except DuplicateDocumentError as e:
+                st.warning(f"⚠️ Skipped {learn_file.name}: {e}.")
+
+    with st.expander("Preferred Terms"):
+        st.caption("Flag a word or phrase in reviews and suggest the preferred wording.")
+        variant = st.text_input("Instead of", key="term_variant", placeholder="power cord")
+        preferred = st.text_input("Use", key="term_preferred", placeholder="power cable")
+        if variant and preferred and st.button("Add Term", key="term_button"):
+            tenant.update(lambda ws: ws.mark_preferred_term(variant, preferred))
+            st.success(f"✅ '{variant}' → '{preferred}' added ({len(tenant.workspace.preferred_terms)} terms).")
 
     with st.expander("Review a New Document"):
         review_file = st.file_uploader("Upload for review", type=["txt", "md", "docx"], key="review_upload")
         if review_file and st.button("Run Review", key="review_button"):
-            ext = review_file.name.split('.')[-1].lower()
-            if ext == "docx":
-                doc = docx.Document(review_file)
-                review_text = "\n".join(p.text for p in doc.paragraphs)
-            else:
-                review_text = review_file.read().decode("utf-8")
-            feedback = workspace.review_document(review_text)
+            with span("extract", source="review"):
+                review_text = extract_text(review_file.name, review_file.getvalue())
             st.subheader("📊 Review Feedback")
-            for category, items in feedback.items():
+            summary = ReviewSummary()
+            panels = {}
+            for category in CATEGORIES:
                 st.markdown(f"#### {category.capitalize()}")
-                for item in (items or ["✅ No issues found."]):
-                    st.write(f"- {item}")
+                panels[category] = st.empty()
+
+            # The read lock is held only to freeze the style model; findings then
+            # stream from the copy, so uploads never wait on a redraw
+            try:
+                reviewer = SnapshotReviewer(tenant.read(lambda ws: ws.style_snapshot()))
+            except ValueError:
+                reviewer = None  # no style model yet: nothing to review against
+
+            # Findings stream in; each panel is redrawn at most every REVIEW_REFRESH_SECONDS
+            last_drawn = {category: 0.0 for category in CATEGORIES}
+            with span("review"):
+                for finding in reviewer.iter_review(review_text) if reviewer is not None else ():
+                    summary.add(finding)
+                    now = time.monotonic()
+                    if now - last_drawn[finding.category] >= REVIEW_REFRESH_SECONDS:
+                        panels[finding.category].markdown("\n".join(f"- {item}" for item in summary.lines(finding.category)))
+                        last_drawn[finding.category] = now
+
+            for category, items in summary.as_feedback().items():
+                panels[category].markdown("\n".join(f"- {item}" for item in (items or ["✅ No issues found."])))
+
+    with st.expander("Bulk Review"):
+        st.caption("Review many drafts at once against a frozen copy of the style model.")
+        bulk_files = st.file_uploader("Upload drafts", type=["txt", "md", "docx"], accept_multiple_files=True, key="bulk_upload")
+        bulk_library = st.checkbox("Include every library document", key="bulk_library")
+        if (bulk_files or bulk_library) and st.button("Run Bulk Review", key="bulk_button"):
+            try:
+                snapshot = tenant.read(lambda ws: ws.style_snapshot())
+            except ValueError as e:
+                st.warning(f"⚠️ {e}.")
+            else:
+                with span("extract", source="bulk_review"):
+                    sources = [ReviewSource("text", f.name, extract_text(f.name, f.getvalue())) for f in bulk_files or []]
+                if bulk_library:
+                    sources += library_documents()
+                bulk_progress = st.progress(0.0, text="Reviewing…")
+                started = time.perf_counter()
+                reviews = review_sources(snapshot, sources, progress=lambda done, total: bulk_progress.progress(done / total, text=f"Reviewed {done} of {total}"))
+                report = BulkReport(reviews, time.perf_counter() - started)
+                bulk_progress.empty()
+                st.text(report.as_text())
+                st.download_button("Download report (JSON)", json.dumps(report.as_dict(), indent=2), file_name="bulk_review.json", mime="application/json")
 
     st.markdown('<div class="sidebar-divider"></div>', unsafe_allow_html=True)
+    cache_stats = get_response_cache().stats()
+    st.caption(f"Response cache: {cache_stats['memory_hits'] + cache_stats['disk_hits']} hits · {cache_stats['misses']} misses · {cache_stats['hit_rate']:.0%} hit rate")
+    st.caption(f"Workspace: {tenant.name}")
+    if tenant.snapshot_error:
+        st.warning(f"⚠️ The saved workspace could not be loaded and was reset ({tenant.snapshot_error}).")
     st.caption("Ghostwriter v0.9 – Streamlit Edition")
 
 
-
-
-# --- Custom Page Layout Style ---
-st.markdown("""
-<style>
-/* Centered content max-width */
-.css-18e3th9 {
-    max-width: 1100px;
-    margin: auto;
-}
-
-/* Section card */
-.section-card {
-    background-color: #fdfdfd;
-    padding: 2rem 1.5rem;
-    border-radius: 0.6rem;
-    box-shadow: 0 1px 6px rgba(0,0,0,0.06);
-    margin-bottom: 2rem;
-}
-.section-card h3 {
-    margin-top: 0;
-}
-
-/* Buttons and toggles */
-.toggle-button {
-    padding: 0.5rem 1rem;
-    margin-top: 0.5rem;
-    border-radius: 0.4rem;
-    border: 1px solid #ccc;
-    background-color: #fafafa;
-}
-.toggle-button:hover {
-    background-color: #f0f0f0;
-}
-</style>
-""", unsafe_allow_html=True)
-
-
 # --- Add Product Info ---
 st.markdown("---")
 st.header("📥 Add Product Information")
@@ -211,49 +276,209 @@ elif st.session_state.input_method == "upload":
     )
 
     if uploaded_file:
-        ext = uploaded_file.name.split('.')[-1].lower()
-        if ext == "pdf":
-            with fitz.open(stream=uploaded_file.read(), filetype="pdf") as pdf:
-                product_info = "".join([page.get_text() for page in pdf])
-        elif ext == "docx":
-            doc = docx.Document(uploaded_file)
-            product_info = "\n".join(p.text for p in doc.paragraphs)
-        else:
-            product_info = uploaded_file.read().decode("utf-8")
+        # Pages stream in on the first pass; later reruns hit the extraction cache
+        extract_status = st.empty()
+        parts = []
+        with span("extract", source="spec"):
+            for part in iter_text(uploaded_file.name, uploaded_file.getvalue()):
+                parts.append(part)
+                if len(parts) % EXTRACT_PROGRESS_EVERY == 0:
+                    extract_status.caption(f"📄 Extracted {len(parts)} pages...")
+        extract_status.empty()
+        product_info = join_parts(uploaded_file.name, parts)
 
     generate_clicked = st.button("🚀 Generate Draft", key="generate_draft_upload")
 
 
 
 # --- Generate Draft ---
-if generate_clicked and product_info:
-    with st.spinner("Generating draft..."):
-        try:
-            client = openai.OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
-            base_prompt = f"""
-You are a technical writer with all the experience and expertise of a 20 year career professional. Generate a professional {st.session_state['doc_type']} for {st.session_state['audience']}.
-Use Markdown format, H1/H2, bullets or numbers, avoid repetition and marketing fluff. Be direct and helpful. 
-"""
-            if "style_guide" in st.session_state:
-                base_prompt += f"\nStrictly follow this additional style guide:\n{st.session_state['style_guide']}"
-
-            user_input = f"""DOCUMENT TYPE: {st.session_state['doc_type']}
-AUDIENCE: {st.session_state['audience']}
-PRODUCT INFO:
-{product_info}
-"""
-
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "system", "content": base_prompt}, {"role": "user", "content": user_input}],
-                temperature=0.4
-            )
+# Requests run on a process-wide job queue so a slow or rate-limited call
+# never blocks the script; the session keeps only the job id
+@st.cache_resource
+def get_job_queue() -> JobQueue:
+    tokens_per_minute = st.secrets.get("GHOSTWRITER_TPM", os.getenv("GHOSTWRITER_TPM"))
+    return JobQueue(
+        OPENAI_API_KEY,
+        OPENAI_BASE_URL,
+        requests_per_minute=float(st.secrets.get("GHOSTWRITER_RPM", os.getenv("GHOSTWRITER_RPM", REQUESTS_PER_MINUTE))),
+        tokens_per_minute=float(tokens_per_minute) if tokens_per_minute else None,
+    )
 
-            draft = response.choices[0].message.content
-            st.session_state["generated_md"] = draft
+if generate_clicked and product_info:
+    # Send only the style rules relevant to this request (0 = whole guide)
+    style_guide = st.session_state.get("style_guide")
+    style_budget = st.session_state.get("style_token_budget", STYLE_TOKEN_BUDGET)
+    st.session_state.pop("style_selection", None)
+    # A fresh draft is a new document, not another version of the last save
+    st.session_state.pop("library_doc", None)
+    with span("prompt_build"):
+        if style_guide is not None and style_budget > 0:
+            selection = select_style_rules(style_guide, doc_type, audience, product_info, style_budget)
+            st.session_state["style_selection"] = selection
+            style_guide = selection.text
+        # Closest approved paragraphs from the learned corpus, as style exemplars
+        exemplars = None
+        if st.session_state.get("use_exemplars", True):
+            exemplars = tenant.read(lambda ws: ws.similar_chunks(product_info, EXEMPLAR_COUNT) if len(ws.chunk_index) else None)
+        st.session_state["exemplar_count"] = len(exemplars or [])
+        messages = build_messages(doc_type, audience, product_info, style_guide, exemplars)
+    # Kept so single sections can be regenerated later with the same settings
+    st.session_state["draft_request"] = {
+        "doc_type": doc_type, "audience": audience, "product_info": product_info,
+        "style_guide": style_guide, "exemplars": exemplars,
+    }
+    key = cache_key(MODEL, messages, TEMPERATURE)
+    cached = None if st.session_state.get("bypass_cache") else get_response_cache().get(key)
+    previous_job = st.session_state.pop("generation_job", None)
+    if previous_job is not None:
+        get_job_queue().cancel(previous_job["id"])
+    if cached is not None:
+        stats = GenerationStats()
+        stats.cached = True
+        st.session_state["generated_md"] = cached
+        st.session_state.setdefault("generation_log", []).append(stats.as_dict())
+        REGISTRY.inc("ghostwriter_generations_total", mode="cached", status="done")
+    else:
+        label = f"{doc_type} ({audience})"
+        if estimate_tokens(product_info) > CONTEXT_TOKEN_BUDGET:
+            job_id = get_job_queue().submit_map_reduce(doc_type, audience, product_info, style_guide, exemplars, label)
+        else:
+            job_id = get_job_queue().submit_draft(messages, st.session_state.get("stream_generation", True), label)
+        st.session_state["generation_job"] = {"id": job_id, "cache_key": key}
+
+
+# Splices regenerated sections into the draft they were requested from
+def apply_section_rewrite(splice: dict, response: str) -> bool:
+    sections = parse_sections(splice["base"])
+    try:
+        rewrites = parse_rewrites(response, splice["indices"])
+    except ValueError as e:
+        st.session_state["generation_error"] = f"{e}; the draft is unchanged."
+        return False
+    st.session_state["generated_md"] = splice_sections(sections, rewrites)
+    share = sum(len(sections[i].text) for i in splice["indices"]) / max(1, len(splice["base"]))
+    st.session_state["section_notice"] = f"🔁 Regenerated {len(rewrites)} of {len(sections)} sections (~{share:.0%} of the draft)."
+    return True
+
+# Polls the running job; once it finishes, its draft replaces the current one
+# (or, for a section rewrite, is spliced into it)
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def generation_panel():
+    current = st.session_state.get("generation_job")
+    job = get_job_queue().get(current["id"]) if current else None
+    if job is None:
+        st.session_state.pop("generation_job", None)
+        return
+
+    if job.done:
+        st.session_state.pop("generation_job")
+        st.session_state.setdefault("generation_log", []).append(job.stats.as_dict())
+        splice = current.get("splice")
+        if job.status == "done":
+            if splice is None:
+                st.session_state["generated_md"] = job.text
+                get_response_cache().put(current["cache_key"], job.text)
+            elif apply_section_rewrite(splice, job.text):
+                get_response_cache().put(current["cache_key"], job.text)
+        elif job.status == "cancelled" and splice is not None:
+            st.session_state["generation_notice"] = "⏹️ Regeneration stopped – the draft is unchanged."
+        elif job.status == "cancelled":
+            if job.text:
+                st.session_state["generated_md"] = job.text
+            st.session_state["generation_notice"] = "⏹️ Generation stopped – the partial draft is kept below."
+        else:
+            st.session_state["generation_error"] = job.error
+        st.rerun(scope="app")
+
+    if job.status == "queued":
+        st.info(f"⏳ Waiting for a free slot ({get_job_queue().pending()} requests in progress or queued)...")
+    elif job.status == "retrying":
+        st.warning(f"🔁 OpenAI is busy – {job.retry_note}")
+    elif job.progress is not None:
+        done, total = job.progress
+        st.progress(done / total, text=f"Condensed section {done} of {total}")
+    else:
+        st.caption("✍️ Generating draft...")
+    if st.button("⏹️ Stop", key="stop_generation"):
+        get_job_queue().cancel(job.id)
+    if job.text:
+        st.markdown(job.text)
+
+if st.session_state.get("generation_notice"):
+    st.warning(st.session_state.pop("generation_notice"))
+if st.session_state.get("section_notice"):
+    st.success(st.session_state.pop("section_notice"))
+if st.session_state.get("generation_error"):
+    st.error(f"Error generating draft: {st.session_state.pop('generation_error')}")
+if st.session_state.get("generation_job"):
+    generation_panel()
+
+# Style guide trimming for the most recent request
+if st.session_state.get("style_selection"):
+    selection = st.session_state["style_selection"]
+    saved = selection.tokens_total - selection.tokens_selected
+    st.caption(
+        f"📘 Style guide: {selection.rules_selected} of {selection.rules_total} rules sent, "
+        f"~{selection.tokens_selected} of {selection.tokens_total} tokens ({saved / selection.tokens_total:.0%} fewer)"
+    )
 
-        except Exception as e:
-            st.error(f"Error generating draft: {e}")
+if st.session_state.get("exemplar_count"):
+    st.caption(f"🧠 {st.session_state['exemplar_count']} approved paragraphs from learned documents included as style exemplars")
+
+# Latency of the most recent request in this session
+if st.session_state.get("generation_log"):
+    last = st.session_state["generation_log"][-1]
+    if last["cached"]:
+        st.caption("⚡ Served from the response cache – tick 'Bypass response cache' for a fresh draft.")
+    elif last["total_latency"] is not None:
+        first_token = f"{last['time_to_first_token']:.2f}s" if last["time_to_first_token"] is not None else "–"
+        if last["sections"] > 1:
+            st.caption(f"⏱️ {last['sections']} spec sections condensed and drafted in {last['total_latency']:.2f}s")
+        else:
+            st.caption(f"⏱️ First token: {first_token} · Total: {last['total_latency']:.2f}s")
+
+# --- PDF Export ---
+# Conversions run on a shared background pool and are cached by Markdown hash
+@st.cache_resource
+def get_pdf_exporter() -> PdfExporter:
+    return PdfExporter()
+
+# A PDF's bytes never change for a given Markdown hash, so each is read once
+@st.cache_data(max_entries=8, show_spinner=False)
+def read_pdf(key: str, path: str) -> bytes:
+    with open(path, "rb") as pdf:
+        return pdf.read()
+
+# Polls only while its conversion runs, then reruns the page to show the download
+@st.fragment(run_every=PDF_POLL_SECONDS)
+def pdf_export_progress(key: str):
+    if get_pdf_exporter().status(key) != "running":
+        st.rerun(scope="app")
+    st.button("⏳ Preparing PDF...", disabled=True, key="pdf_preparing")
+
+# A fragment, so starting a conversion doesn't rerun the rest of the page
+@st.fragment
+def pdf_export_panel(markdown: str):
+    exporter = get_pdf_exporter()
+    key = content_hash(markdown)
+    status = exporter.status(key)
+    path = exporter.cached_path(key) if status == "ready" else None
+    if path is not None:
+        st.download_button("📄 Download PDF", read_pdf(key, path), file_name="draft.pdf", mime="application/pdf")
+    elif status == "running":
+        pdf_export_progress(key)
+    else:
+        if status == "failed":
+            st.error(f"PDF export failed: {exporter.error(key)}")
+        if st.button("📄 Export to PDF", key="pdf_export"):
+            exporter.submit(markdown)
+            st.rerun(scope="fragment")
+
+# Rendered once per distinct draft rather than on every rerun
+@st.cache_data(max_entries=32, show_spinner=False)
+def render_html(markdown: str) -> str:
+    import markdown2
+    return markdown2.markdown(markdown)
 
 # --- Display Draft, Download, and Save ---
 if "generated_md" in st.session_state:
@@ -264,26 +489,73 @@ if "generated_md" in st.session_state:
         height=400
     )
 
+    # --- Regenerate Sections ---
+    # Only the chosen H1/H2 sections are rewritten. The rest of the draft is
+    # sent abridged, as context, and kept as is – manual edits included.
+    draft_sections = parse_sections(edited_md)
+    draft_request = st.session_state.get("draft_request")
+    if draft_request is not None and len(draft_sections) > 1:
+        with st.expander("🔁 Regenerate Sections"):
+            chosen = st.multiselect(
+                "Sections to rewrite", list(range(len(draft_sections))),
+                format_func=lambda i: draft_sections[i].label, key="regen_sections",
+            )
+            instructions = st.text_input("What changed?", key="regen_instructions", placeholder="The charger is now USB-C")
+            busy = bool(st.session_state.get("generation_job"))
+            if chosen and st.button("🔁 Regenerate Selected", key="regen_button", disabled=busy):
+                spec = product_info or draft_request["product_info"]
+                if estimate_tokens(spec) > CONTEXT_TOKEN_BUDGET:
+                    st.warning("⚠️ This spec is too large to send with a section rewrite – generate the whole draft instead.")
+                else:
+                    indices = sorted(chosen)
+                    with span("prompt_build"):
+                        messages = build_section_messages(
+                            draft_request["doc_type"], draft_request["audience"], spec, draft_sections, indices,
+                            instructions, draft_request["style_guide"], draft_request["exemplars"],
+                        )
+                    splice = {"base": edited_md, "indices": indices}
+                    key = cache_key(MODEL, messages, TEMPERATURE)
+                    cached = None if st.session_state.get("bypass_cache") else get_response_cache().get(key)
+                    if cached is not None:
+                        stats = GenerationStats()
+                        stats.cached = True
+                        st.session_state.setdefault("generation_log", []).append(stats.as_dict())
+                        REGISTRY.inc("ghostwriter_generations_total", mode="cached", status="done")
+                        apply_section_rewrite(splice, cached)
+                    else:
+                        label = f"{len(indices)} sections of {draft_request['doc_type']} ({draft_request['audience']})"
+                        job_id = get_job_queue().submit_draft(messages, st.session_state.get("stream_generation", True), label)
+                        st.session_state["generation_job"] = {"id": job_id, "cache_key": key, "splice": splice}
+                    st.rerun()
+
+    # What the draft is: the saved library document's metadata, else the request
+    # it was generated from. The sidebar may have moved on since.
+    saved = st.session_state.get("library_doc")
+    draft_meta = {
+        "id": "draft",
+        "name": "Draft",
+        "type": (draft_request or {}).get("doc_type", st.session_state.get("doc_type", "Quick Start")),
+        "audience": (draft_request or {}).get("audience", st.session_state.get("audience", "End User")),
+        **(saved or {}),
+    }
+
     st.markdown("### 📥 Download Options")
-    col1, col2, col3 = st.columns(3)
+    col1, col2, col3, col4 = st.columns(4)
 
     with col1:
         st.download_button("⬇️ Download Markdown", edited_md, file_name="draft.md", mime="text/markdown")
 
     with col2:
-        html_output = markdown2.markdown(edited_md)
+        html_output = render_html(edited_md)
         st.download_button("🌐 Export to HTML", html_output, file_name="draft.html", mime="text/html")
 
     with col3:
-        with tempfile.NamedTemporaryFile("w+", suffix=".md", delete=False) as tmp:
-            tmp.write(edited_md)
-            tmp_path = tmp.name
-        try:
-            subprocess.run(["pandoc", tmp_path, "-o", tmp_path.replace(".md", ".pdf")], check=True)
-            with open(tmp_path.replace(".md", ".pdf"), "rb") as pdf:
-                st.download_button("📄 Export to PDF", pdf.read(), file_name="draft.pdf", mime="application/pdf")
-        except Exception as e:
-            st.error(f"PDF export failed: {e}")
+        pdf_export_panel(edited_md)
+
+    with col4:
+        # One record per heading-scoped chunk; a saved draft keeps its library ID
+        draft_doc = {**draft_meta, "content": edited_md}
+        st.download_button("🤖 Export chatbot JSONL", export_jsonl(draft_doc), file_name="draft.jsonl", mime="application/jsonl")
 
     st.markdown("---")
     st.subheader("💾 Save to Document Library?")
@@ -291,37 +563,56 @@ if "generated_md" in st.session_state:
     save_col1, save_col2 = st.columns([2, 1])
 
     with save_col1:
-        default_title = f"{st.session_state.get('doc_type', 'Document')} – {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+        default_title = f"{draft_meta['type']} – {datetime.now().strftime('%Y-%m-%d %H:%M')}"
         custom_title = st.text_input("Document Title", value=default_title)
 
     with save_col2:
+        as_new_version = saved is not None and st.radio(
+            "Save as",
+            [f"New version of '{saved['name']}'", "New document"],
+            key="save_mode",
+        ) != "New document"
         if st.button("✅ Save Draft"):
-            try:
-                os.makedirs("docs", exist_ok=True)
-                doc_id = str(uuid.uuid4())
-                doc_data = {
-                    "id": doc_id,
-                    "name": custom_title,
-                    "type": st.session_state.get("doc_type", "Quick Start"),
-                    "audience": st.session_state.get("audience", "End User"),
-                    "date": datetime.now().strftime("%Y-%m-%d"),
-                    "content": edited_md,
-                    "tags": [],
-                    "filename": f"{doc_id}.md"
-                }
-                with open(f"docs/{doc_id}.json", "w") as f:
-                    json.dump(doc_data, f, indent=2)
-                st.success(f"✅ '{custom_title}' saved to your document library!")
-            except Exception as e:
-                st.error(f"Failed to save draft: {e}")
-
-# --- Load persisted style guide at startup ---
-STYLE_PATH = "style_guide.txt"
-
-if "style_guide" not in st.session_state and os.path.exists(STYLE_PATH):
-    with open(STYLE_PATH, "r") as f:
-        st.session_state["style_guide"] = f.read()
-        st.session_state["style_uploaded_at"] = datetime.fromtimestamp(os.path.getmtime(STYLE_PATH)).strftime("%Y-%m-%d %H:%M:%S")
+            # Near-copies of library documents are held back until confirmed
+            duplicates = []
+            if not as_new_version and not st.session_state.get("save_allow_duplicates"):
+                duplicates = find_duplicates(edited_md)
+            st.session_state["save_duplicates"] = [f"'{d['name']}' ({d['similarity']:.0%})" for d in duplicates]
+            if duplicates:
+                st.warning(f"⚠️ Not saved: near-duplicate of {', '.join(st.session_state['save_duplicates'])}.")
+            else:
+                try:
+                    doc_data = new_document(custom_title, draft_meta["type"], draft_meta["audience"], edited_md)
+                    if as_new_version:
+                        doc_data["id"] = saved["id"]
+                        doc_data["filename"] = f"{saved['id']}.md"
+                    with span("library_save"):
+                        version = save_document(doc_data)
+                    st.session_state["library_doc"] = {
+                        "id": doc_data["id"], "name": custom_title, "type": doc_data["type"], "audience": doc_data["audience"],
+                    }
+                    st.success(f"✅ '{custom_title}' saved to your document library (version {version})!")
+                except Exception as e:
+                    st.error(f"Failed to save draft: {e}")
+        if st.session_state.get("save_duplicates"):
+            st.checkbox("Save even if a near-duplicate exists", key="save_allow_duplicates")
+
+# --- Load persisted style guide ---
+# Each tenant has its own; switching tenant in the URL reloads it. The file is
+# read once per process and again only when its mtime changes, which is also
+# how a guide saved from another session gets picked up.
+saved_style = tenant.style_guide()
+saved_style_mtime = saved_style[1] if saved_style is not None else None
+if st.session_state.get("style_tenant") != tenant.name:
+    st.session_state.pop("style_guide_key", None)
+if st.session_state.get("style_tenant") != tenant.name or st.session_state.get("style_mtime") != saved_style_mtime:
+    for session_key in ("style_guide", "style_uploaded_at", "style_uploaded_by"):
+        st.session_state.pop(session_key, None)
+    st.session_state["style_tenant"] = tenant.name
+    st.session_state["style_mtime"] = saved_style_mtime
+    if saved_style is not None:
+        st.session_state["style_guide"] = saved_style[0]
+        st.session_state["style_uploaded_at"] = datetime.fromtimestamp(saved_style[1]).strftime("%Y-%m-%d %H:%M:%S")
         st.session_state["style_uploaded_by"] = os.getenv("USER", "Unknown User")
 
 # --- Upload Style Guide ---
@@ -335,25 +626,19 @@ with st.expander("📘 Upload a Style Guide", expanded=style_guide_expanded):
         key="style_guide_upload"
     )
 
-    if style_file:
-        ext = style_file.name.split('.')[-1].lower()
-
-        if ext == "pdf":
-            with fitz.open(stream=style_file.read(), filetype="pdf") as pdf:
-                style_text = "".join([page.get_text() for page in pdf])
-        elif ext == "docx":
-            doc = docx.Document(style_file)
-            style_text = "\n".join([p.text for p in doc.paragraphs])
-        else:
-            style_text = style_file.read().decode("utf-8")
+    # Only a newly uploaded file is extracted and saved, not every rerun
+    style_key = content_key(style_file.name, style_file.getvalue()) if style_file else None
+    if style_file and st.session_state.get("style_guide_key") != style_key:
+        with span("extract", source="style_guide"):
+            style_text = extract_text(style_file.name, style_file.getvalue())
 
         # Save to session and disk
         st.session_state["style_guide"] = style_text
+        st.session_state["style_guide_key"] = style_key
         st.session_state["style_uploaded_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         st.session_state["style_uploaded_by"] = os.getenv("USER", "Unknown User")
 
-        with open("style_guide.txt", "w") as f:
-            f.write(style_text)
+        st.session_state["style_mtime"] = tenant.save_style_guide(style_text)
 
         st.success(f"""
 ✅ **Style guide uploaded and saved!**
@@ -371,8 +656,13 @@ if "style_guide" in st.session_state:
 - **Uploaded at:** {st.session_state.get('style_uploaded_at', 'Unknown')}
 """)
 
+# --- Script Timing ---
+# The first run in a process includes imports and cache warm-up; the rest are
+# reruns. Both show on the Metrics page as ghostwriter_script_seconds.
+@st.cache_resource
+def get_run_counter() -> dict:
+    return {"runs": 0}
 
-
-
-
-
+run_counter = get_run_counter()
+run_counter["runs"] += 1
+REGISTRY.observe("ghostwriter_script_seconds", time.perf_counter() - SCRIPT_STARTED, run="first" if run_counter["runs"] == 1 else "rerun")
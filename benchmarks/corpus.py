@@ -0,0 +1,67 @@
+# benchmarks/corpus.py
+#
+# Seeded synthetic text: the same seed always gives the same corpus, so
+# timings from different commits measure the code, not the data.
+
+from typing import Iterator, List
+import random
+
+# Phrases the reviewer reacts to, mixed into generated sentences
+PASSIVE_PHRASES = ["was configured", "is installed", "were updated", "been removed"]
+TERM_VARIANTS = ["power cord", "log in", "e-mail", "wifi"]
+PREFERRED_TERMS = {"power cord": "power cable", "log in": "sign in", "e-mail": "email", "wifi": "Wi-Fi"}
+
+_SYLLABLES = ["ka", "lo", "mi", "ne", "ra", "to", "vi", "su", "de", "po", "ga", "fi", "ze", "hu", "ba", "qui"]
+
+
+def make_vocabulary(size: int = 5000, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(1, 4))))
+    return sorted(words)
+
+
+class CorpusGenerator:
+    def __init__(self, seed: int = 0, vocabulary_size: int = 5000):
+        self.rng = random.Random(seed)
+        self.vocabulary = make_vocabulary(vocabulary_size, seed)
+        # Zipf-like weights, as in real prose a few words dominate
+        self.weights = [1 / (rank + 1) for rank in range(len(self.vocabulary))]
+
+    def words(self, count: int) -> List[str]:
+        return self.rng.choices(self.vocabulary, self.weights, k=count)
+
+    def sentence(self, max_words: int = 32) -> str:
+        words = self.words(self.rng.randint(4, max_words))
+        roll = self.rng.random()
+        if roll < 0.1:
+            words.insert(self.rng.randrange(len(words)), self.rng.choice(PASSIVE_PHRASES))
+        elif roll < 0.15:
+            words.insert(self.rng.randrange(len(words)), self.rng.choice(TERM_VARIANTS))
+        return " ".join(words).capitalize() + "."
+
+    # Markdown with headings and paragraphs of a few sentences
+    def document(self, words: int) -> str:
+        lines = []
+        written = 0
+        while written < words:
+            if self.rng.random() < 0.2:
+                lines.append(f"## {' '.join(self.words(3)).title()}")
+            paragraph = " ".join(self.sentence() for _ in range(self.rng.randint(2, 6)))
+            lines.append(paragraph)
+            written += len(paragraph.split())
+        return "\n\n".join(lines)
+
+    def corpus(self, documents: int, words: int) -> Iterator[str]:
+        for _ in range(documents):
+            yield self.document(words)
+
+    def style_guide(self, rules: int) -> str:
+        lines = []
+        for i in range(rules):
+            if i % 10 == 0:
+                heading = "Mandatory Rules" if i == 0 else " ".join(self.words(2)).title()
+                lines.append(f"\n## {heading}")
+            lines.append(f"- {self.sentence(16)}")
+        return "\n".join(lines).strip()
@@ -0,0 +1,360 @@
+# benchmarks/run.py
+#
+# Reproducible benchmarks for the workspace, reviewer, extraction, library,
+# style selection, generation and start-up paths. Results are written as
+# JSON so runs from two commits can be compared.
+#
+#   python -m benchmarks.run --scale small --output bench.json
+#   python -m benchmarks.run --scale small --compare bench.json --fail-on-regression
+
+from typing import Callable, Dict, List, Optional
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import tracemalloc
+from datetime import datetime, timezone
+
+from benchmarks.corpus import PREFERRED_TERMS, CorpusGenerator
+from benchmarks.stub_llm import AsyncStubClient, StubClient
+
+# Document counts, document sizes and input sizes per scale
+SCALES = {
+    "small": {
+        "workspace_docs": [10, 100, 1000],
+        "library_docs": [100, 1000],
+        "doc_words": 300,
+        "review_words": [10_000, 100_000],
+        "extract_words": [100_000],
+        "style_rules": [50, 500],
+        "spec_words": [5_000, 50_000],
+    },
+    "medium": {
+        "workspace_docs": [10, 1000, 10_000],
+        "library_docs": [1000, 10_000],
+        "doc_words": 300,
+        "review_words": [10_000, 100_000, 1_000_000],
+        "extract_words": [100_000, 1_000_000],
+        "style_rules": [50, 500, 2000],
+        "spec_words": [5_000, 50_000, 200_000],
+    },
+    "large": {
+        "workspace_docs": [10, 1000, 10_000, 100_000],
+        "library_docs": [1000, 10_000, 100_000],
+        "doc_words": 300,
+        "review_words": [10_000, 100_000, 1_000_000],
+        "extract_words": [100_000, 1_000_000],
+        "style_rules": [50, 500, 2000],
+        "spec_words": [5_000, 50_000, 200_000],
+    },
+}
+
+# A result this much slower than the baseline is reported as a regression
+REGRESSION_RATIO = 1.2
+
+BENCHMARKS: Dict[str, Callable] = {}
+
+
+def benchmark(name: str):
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+class Recorder:
+    def __init__(self, repeat: int):
+        self.repeat = repeat
+        self.results: List[Dict] = []
+
+    # Times fn `repeat` times (once when once=True, for work that can't be
+    # repeated on the same state) and records the median
+    def measure(self, name: str, params: Dict, fn: Callable, items: int = 1, once: bool = False):
+        runs = []
+        for _ in range(1 if once else self.repeat):
+            started = time.perf_counter()
+            fn()
+            runs.append(time.perf_counter() - started)
+        seconds = statistics.median(runs)
+        self.results.append({
+            "name": name,
+            "params": params,
+            "seconds": seconds,
+            "runs": runs,
+            "items_per_second": items / seconds if seconds else None,
+        })
+        print(f"  {name:<32} {json.dumps(params):<40} {seconds * 1000:10.2f} ms", file=sys.stderr)
+
+    # Bytes still allocated by whatever fn returns; tracked, not compared
+    def measure_memory(self, name: str, params: Dict, fn: Callable):
+        tracemalloc.start()
+        try:
+            kept = fn()
+            allocated = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        del kept
+        self.results.append({"name": name, "params": params, "seconds": None, "bytes": allocated})
+        print(f"  {name:<32} {json.dumps(params):<40} {allocated / 1024:10.1f} KiB", file=sys.stderr)
+
+
+@benchmark("workspace")
+def bench_workspace(recorder: Recorder, scale: Dict, corpus: CorpusGenerator):
+    from ghostwriter_doc_learning import Document, Workspace
+
+    for count in scale["workspace_docs"]:
+        params = {"docs": count, "words": scale["doc_words"]}
+        documents = list(corpus.corpus(count, scale["doc_words"]))
+        workspace = Workspace()
+
+        def ingest():
+            for i, text in enumerate(documents):
+                workspace.upload_document(text, f"doc{i}.md", "final", allow_duplicates=True)
+
+        recorder.measure("workspace.ingest", params, ingest, items=count, once=True)
+        recorder.measure("workspace.build_model", params, workspace.build_model)
+        recorder.measure("workspace.similar_chunks", params, lambda: workspace.similar_chunks(documents[0][:2000], 3))
+        recorder.measure("workspace.find_duplicates", params, lambda: workspace.find_duplicates(documents[-1]))
+        # Document objects only: the content strings already exist and are shared
+        recorder.measure_memory("workspace.document_memory", params,
+                                lambda: [Document(text, "doc.md", "final") for text in documents])
+
+        def iterate_chunks():
+            for doc in workspace.documents:
+                for _ in doc.iter_chunks():
+                    pass
+
+        recorder.measure("workspace.iterate_chunks", params, iterate_chunks, items=count)
+
+        with tempfile.TemporaryDirectory(prefix="ghostwriter-bench-") as tmp:
+            path = os.path.join(tmp, "workspace.snapshot")
+            recorder.measure("workspace.save_snapshot", params, lambda: workspace.save_snapshot(path))
+            recorder.measure("workspace.load_snapshot", params, lambda: Workspace.load_snapshot(path))
+
+
+@benchmark("review")
+def bench_review(recorder: Recorder, scale: Dict, corpus: CorpusGenerator):
+    from ghostwriter_doc_learning import Workspace
+
+    workspace = Workspace()
+    for i, text in enumerate(corpus.corpus(10, scale["doc_words"])):
+        workspace.upload_document(text, f"doc{i}.md", "final", allow_duplicates=True)
+    for variant, preferred in PREFERRED_TERMS.items():
+        workspace.mark_preferred_term(variant, preferred)
+    workspace.build_model()
+
+    for words in scale["review_words"]:
+        text = corpus.document(words)
+        recorder.measure("review.review_document", {"words": words}, lambda: workspace.review_document(text), items=words)
+
+
+@benchmark("extract")
+def bench_extract(recorder: Recorder, scale: Dict, corpus: CorpusGenerator):
+    import ghostwriter_extract
+
+    for words in scale["extract_words"]:
+        data = corpus.document(words).encode("utf-8")
+
+        def cold():
+            ghostwriter_extract._cache.clear()
+            ghostwriter_extract.extract_text("spec.md", data)
+
+        recorder.measure("extract.text_cold", {"words": words}, cold, items=words)
+        recorder.measure("extract.text_cached", {"words": words}, lambda: ghostwriter_extract.extract_text("spec.md", data), items=words)
+
+        try:
+            import docx
+        except ImportError:
+            print("  extract.docx skipped: python-docx is not installed", file=sys.stderr)
+            continue
+        import io
+        document = docx.Document()
+        for paragraph in data.decode("utf-8").split("\n\n"):
+            document.add_paragraph(paragraph)
+        buffer = io.BytesIO()
+        document.save(buffer)
+        docx_data = buffer.getvalue()
+
+        def cold_docx():
+            ghostwriter_extract._cache.clear()
+            ghostwriter_extract.extract_text("spec.docx", docx_data)
+
+        recorder.measure("extract.docx_cold", {"words": words}, cold_docx, items=words)
+
+
+@benchmark("library")
+def bench_library(recorder: Recorder, scale: Dict, corpus: CorpusGenerator):
+    from contextlib import closing
+    import ghostwriter_library as library
+
+    for count in scale["library_docs"]:
+        params = {"docs": count, "words": scale["doc_words"]}
+        with tempfile.TemporaryDirectory(prefix="ghostwriter-bench-") as docs_dir:
+            documents = [
+                library.new_document(f"Document {i}", "FAQ", "End User", text, ["bench"])
+                for i, text in enumerate(corpus.corpus(count, scale["doc_words"]))
+            ]
+
+            def populate():
+                with closing(library.connect(docs_dir)) as conn, conn:
+                    for doc in documents:
+                        library._write_document(conn, doc)
+
+            recorder.measure("library.populate", params, populate, items=count, once=True)
+            query = " ".join(documents[count // 2]["content"].split()[:3])
+            new_doc = library.new_document("Extra", "FAQ", "End User", corpus.document(scale["doc_words"]))
+            edited = dict(documents[0], content=documents[0]["content"] + "\n\nOne more paragraph.")
+
+            recorder.measure("library.sync_index_unchanged", params, lambda: library.sync_index(docs_dir))
+            recorder.measure("library.count_documents", params, lambda: library.count_documents(docs_dir))
+            recorder.measure("library.list_first_page", params, lambda: library.list_documents(25, 0, docs_dir))
+            recorder.measure("library.list_last_page", params, lambda: library.list_documents(25, count - 25, docs_dir))
+            recorder.measure("library.search", params, lambda: library.search_documents(query, 50, docs_dir))
+            recorder.measure("library.load_document", params, lambda: library.load_document(documents[0]["id"], docs_dir))
+            recorder.measure("library.find_duplicates", params, lambda: library.find_duplicates(documents[1]["content"], docs_dir=docs_dir))
+            recorder.measure("library.save_new", params, lambda: library.save_document(new_doc, docs_dir), once=True)
+            recorder.measure("library.save_version", params, lambda: library.save_document(edited, docs_dir), once=True)
+
+
+@benchmark("style")
+def bench_style(recorder: Recorder, scale: Dict, corpus: CorpusGenerator):
+    from ghostwriter_style import StyleGuideIndex
+
+    query = corpus.document(500)
+    for rules in scale["style_rules"]:
+        guide = corpus.style_guide(rules)
+        recorder.measure("style.index", {"rules": rules}, lambda: StyleGuideIndex(guide))
+        index = StyleGuideIndex(guide)
+        recorder.measure("style.select", {"rules": rules}, lambda: index.select(query))
+
+
+@benchmark("generation")
+def bench_generation(recorder: Recorder, scale: Dict, corpus: CorpusGenerator):
+    from ghostwriter_generation import GenerationStats, build_messages, generate_draft, map_reduce_draft, stream_draft
+
+    guide = corpus.style_guide(50)
+    for words in scale["spec_words"]:
+        spec = corpus.document(words)
+        params = {"spec_words": words}
+        client = StubClient()
+        messages = build_messages("Quick Start", "End User", spec, guide)
+        recorder.measure("generation.build_messages", params, lambda: build_messages("Quick Start", "End User", spec, guide))
+        recorder.measure("generation.generate_draft", params, lambda: generate_draft(client, messages, GenerationStats()))
+        recorder.measure("generation.stream_draft", params, lambda: "".join(stream_draft(client, messages, GenerationStats())))
+        async_client = AsyncStubClient()
+        recorder.measure(
+            "generation.map_reduce_draft", params,
+            lambda: asyncio.run(map_reduce_draft(async_client, "Quick Start", "End User", spec, guide)),
+        )
+
+
+# What app.py imports before drawing anything, Streamlit itself aside
+APP_MODULES = [
+    "ghostwriter_bulk_review", "ghostwriter_cache", "ghostwriter_doc_learning", "ghostwriter_export",
+    "ghostwriter_extract", "ghostwriter_generation", "ghostwriter_jobs", "ghostwriter_library", "ghostwriter_metrics",
+    "ghostwriter_preload", "ghostwriter_review", "ghostwriter_sections", "ghostwriter_style", "ghostwriter_tenants",
+]
+
+
+@benchmark("startup")
+def bench_startup(recorder: Recorder, scale: Dict, corpus: CorpusGenerator):
+    from ghostwriter_tenants import Tenant
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    def fresh_interpreter(statement: str):
+        subprocess.run([sys.executable, "-c", statement], cwd=root, check=True)
+
+    # Interpreter start-up alone, to subtract from the import figures
+    recorder.measure("startup.interpreter", {}, lambda: fresh_interpreter("pass"))
+    recorder.measure("startup.import_app_modules", {}, lambda: fresh_interpreter(f"import {', '.join(APP_MODULES)}"))
+
+    # Every rerun checks the tenant's style guide; unchanged, that's one stat
+    with tempfile.TemporaryDirectory(prefix="ghostwriter-bench-") as tmp:
+        for rules in scale["style_rules"]:
+            tenant = Tenant(f"bench-{rules}", tmp)
+            tenant.save_style_guide(corpus.style_guide(rules))
+            recorder.measure("startup.style_guide_check", {"rules": rules}, tenant.style_guide)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _result_key(result: Dict) -> str:
+    return f"{result['name']} {json.dumps(result['params'], sort_keys=True)}"
+
+
+# One line per benchmark found in both runs; returns the regressions
+def compare(baseline: Dict, current: Dict, ratio: float = REGRESSION_RATIO) -> List[str]:
+    before = {_result_key(r): r["seconds"] for r in baseline["results"]}
+    regressions = []
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'}:", file=sys.stderr)
+    for result in current["results"]:
+        key = _result_key(result)
+        if key not in before or not before[key] or result["seconds"] is None:
+            continue
+        change = result["seconds"] / before[key]
+        flag = ""
+        if change > ratio:
+            flag = "  REGRESSION"
+            regressions.append(key)
+        elif change < 1 / ratio:
+            flag = "  faster"
+        print(f"  {key:<72} {before[key] * 1000:10.2f} -> {result['seconds'] * 1000:10.2f} ms ({change:.2f}x){flag}", file=sys.stderr)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark Ghostwriter on synthetic corpora")
+    parser.add_argument("--scale", choices=list(SCALES), default="small")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), metavar="BENCHMARK",
+                        help=f"subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON results of an earlier run")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+
+    scale = SCALES[args.scale]
+    recorder = Recorder(args.repeat)
+    for name in args.only or list(BENCHMARKS):
+        print(f"{name}:", file=sys.stderr)
+        BENCHMARKS[name](recorder, scale, CorpusGenerator(args.seed))
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": args.scale,
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "results": recorder.results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            regressions = compare(json.load(f), report)
+        if regressions and args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+# benchmarks/stub_llm.py
+#
+# In-process stand-ins for openai.OpenAI / openai.AsyncOpenAI. They answer
+# chat.completions.create with a canned draft after a configurable delay, so
+# generation benchmarks time our code rather than the network.
+
+from types import SimpleNamespace
+from typing import Dict, List
+import time
+import asyncio
+
+STUB_DRAFT = "\n\n".join(
+    f"## Section {i}\n\nThis placeholder paragraph stands in for generated documentation text."
+    for i in range(1, 21)
+)
+
+
+def _response(content: str):
+    message = SimpleNamespace(role="assistant", content=content)
+    usage = SimpleNamespace(prompt_tokens=0, completion_tokens=len(content.split()), total_tokens=len(content.split()))
+    return SimpleNamespace(choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")], usage=usage)
+
+
+class _Stream:
+    def __init__(self, content: str, token_delay: float):
+        self._pieces = iter(content.split(" "))
+        self._token_delay = token_delay
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        piece = next(self._pieces)
+        if self._token_delay:
+            time.sleep(self._token_delay)
+        return SimpleNamespace(choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content=piece + " "), finish_reason=None)])
+
+    def close(self):
+        pass
+
+
+class _Completions:
+    def __init__(self, owner):
+        self._owner = owner
+
+    def create(self, model: str, messages: List[Dict[str, str]], temperature: float = 0.0, stream: bool = False, **kwargs):
+        self._owner.calls += 1
+        time.sleep(self._owner.latency)
+        if stream:
+            return _Stream(self._owner.draft, self._owner.token_delay)
+        return _response(self._owner.draft)
+
+
+class _AsyncCompletions:
+    def __init__(self, owner):
+        self._owner = owner
+
+    async def create(self, model: str, messages: List[Dict[str, str]], temperature: float = 0.0, **kwargs):
+        self._owner.calls += 1
+        await asyncio.sleep(self._owner.latency)
+        return _response(self._owner.draft)
+
+
+class StubClient:
+    def __init__(self, latency: float = 0.0, token_delay: float = 0.0, draft: str = STUB_DRAFT):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.draft = draft
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=_Completions(self))
+
+
+class AsyncStubClient:
+    def __init__(self, latency: float = 0.0, draft: str = STUB_DRAFT):
+        self.latency = latency
+        self.draft = draft
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=_AsyncCompletions(self))
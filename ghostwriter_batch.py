@@ -0,0 +1,204 @@
+# ghostwriter_batch.py
+#
+# Headless generation: every spec file in a directory × every document type ×
+# every audience, written straight into the docs/ library.
+#
+#   python ghostwriter_batch.py specs/ --workers 4 --rpm 60 --tpm 200000
+
+from typing import Dict, List, NamedTuple, Optional
+import os
+import sys
+import time
+import asyncio
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from ghostwriter_generation import (
+    AUDIENCES, CONTEXT_TOKEN_BUDGET, DOC_TYPES, MODEL, TEMPERATURE, build_messages, estimate_tokens,
+    make_async_client, make_client, map_reduce_draft,
+)
+from ghostwriter_extract import extract_file
+from ghostwriter_library import DOCS_DIR, new_document, save_document
+from ghostwriter_ratelimit import EXPECTED_OUTPUT_TOKENS, RateLimiter, acall_with_retries, call_with_retries
+from ghostwriter_style import STYLE_TOKEN_BUDGET, select_style_rules
+
+SPEC_EXTENSIONS = {"txt", "md", "pdf", "docx", "rtf"}
+STYLE_PATH = "style_guide.txt"
+
+
+class BatchJob(NamedTuple):
+    spec_path: str
+    doc_type: str
+    audience: str
+
+
+class BatchResult(NamedTuple):
+    job: BatchJob
+    doc_id: Optional[str]
+    latency: float
+    prompt_tokens: int
+    completion_tokens: int
+    error: Optional[str]
+
+
+def find_specs(spec_dir: str) -> List[str]:
+    return sorted(
+        entry.path for entry in os.scandir(spec_dir)
+        if entry.is_file() and entry.name.rsplit(".", 1)[-1].lower() in SPEC_EXTENSIONS
+    )
+
+
+class BatchRunner:
+    def __init__(self, api_key: str, base_url: Optional[str] = None, workers: int = 4,
+                 requests_per_minute: float = 60, tokens_per_minute: Optional[float] = None,
+                 style_guide: Optional[str] = None, style_token_budget: int = STYLE_TOKEN_BUDGET,
+                 docs_dir: str = DOCS_DIR, verbose: bool = True):
+        # Retries are handled here so they can respect the shared limiter
+        self.client = make_client(api_key, base_url, max_retries=0)
+        self.api_key = api_key
+        self.base_url = base_url
+        self.workers = workers
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.style_guide = style_guide
+        self.style_token_budget = style_token_budget
+        self.docs_dir = docs_dir
+        self.verbose = verbose
+        self._spec_text: Dict[str, str] = {}
+        self._spec_locks: Dict[str, threading.Lock] = {}
+        self._spec_lock = threading.Lock()
+
+    def _log(self, message: str):
+        if self.verbose:
+            print(message, file=sys.stderr)
+
+    # Each spec is extracted once, under its own lock: workers on other specs
+    # don't wait while a large PDF is parsed
+    def _spec(self, path: str) -> str:
+        with self._spec_lock:
+            lock = self._spec_locks.setdefault(path, threading.Lock())
+        with lock:
+            if path not in self._spec_text:
+                self._spec_text[path] = extract_file(path)
+            return self._spec_text[path]
+
+    def _style_guide_for(self, job: BatchJob, product_info: str) -> Optional[str]:
+        if self.style_guide is None or self.style_token_budget <= 0:
+            return self.style_guide
+        return select_style_rules(self.style_guide, job.doc_type, job.audience, product_info, self.style_token_budget).text
+
+    def _generate(self, job: BatchJob, product_info: str):
+        style_guide = self._style_guide_for(job, product_info)
+
+        def on_retry(attempt: int, error: Exception, delay: float):
+            self._log(f"  retry {attempt} for {os.path.basename(job.spec_path)} / {job.doc_type} / {job.audience} in {delay:.1f}s ({error.__class__.__name__})")
+
+        if estimate_tokens(product_info) > CONTEXT_TOKEN_BUDGET:
+            # Each section and reduce request goes through the shared limiter and is retried on its own
+            async_client = make_async_client(self.api_key, self.base_url, max_retries=0)
+            draft = asyncio.run(map_reduce_draft(
+                async_client, job.doc_type, job.audience, product_info, style_guide,
+                send=lambda request, tokens: acall_with_retries(request, self.limiter, tokens, on_retry=on_retry),
+            ))
+            return draft, estimate_tokens(product_info), estimate_tokens(draft)
+
+        messages = build_messages(job.doc_type, job.audience, product_info, style_guide)
+        prompt_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+
+        response = call_with_retries(
+            lambda: self.client.chat.completions.create(model=MODEL, messages=messages, temperature=TEMPERATURE),
+            limiter=self.limiter,
+            tokens=prompt_tokens + EXPECTED_OUTPUT_TOKENS,
+            on_retry=on_retry,
+        )
+        draft = response.choices[0].message.content
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            return draft, usage.prompt_tokens, usage.completion_tokens
+        return draft, prompt_tokens, estimate_tokens(draft)
+
+    def run_job(self, job: BatchJob) -> BatchResult:
+        started = time.perf_counter()
+        try:
+            draft, prompt_tokens, completion_tokens = self._generate(job, self._spec(job.spec_path))
+            product = os.path.splitext(os.path.basename(job.spec_path))[0]
+            doc_data = new_document(f"{product} – {job.doc_type} ({job.audience})", job.doc_type, job.audience, draft, [product, "batch"])
+            save_document(doc_data, self.docs_dir)
+            return BatchResult(job, doc_data["id"], time.perf_counter() - started, prompt_tokens, completion_tokens, None)
+        except Exception as e:
+            return BatchResult(job, None, time.perf_counter() - started, 0, 0, f"{e.__class__.__name__}: {e}")
+
+    def run(self, spec_paths: List[str], doc_types: List[str] = DOC_TYPES, audiences: List[str] = AUDIENCES) -> List[BatchResult]:
+        jobs = [BatchJob(path, doc_type, audience) for path in spec_paths for doc_type in doc_types for audience in audiences]
+        results = []
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(self.run_job, job) for job in jobs]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                status = "ok" if result.error is None else f"FAILED ({result.error})"
+                self._log(f"[{len(results)}/{len(jobs)}] {os.path.basename(result.job.spec_path)} / {result.job.doc_type} / {result.job.audience}: {status} in {result.latency:.1f}s")
+        return results
+
+
+def summarize(results: List[BatchResult], wall_time: float) -> str:
+    succeeded = [r for r in results if r.error is None]
+    completion_tokens = sum(r.completion_tokens for r in succeeded)
+    prompt_tokens = sum(r.prompt_tokens for r in succeeded)
+    latencies = sorted(r.latency for r in succeeded)
+    lines = [
+        f"Documents: {len(succeeded)} generated, {len(results) - len(succeeded)} failed",
+        f"Wall time: {wall_time:.1f}s",
+        f"Throughput: {len(succeeded) / wall_time * 60 if wall_time else 0:.1f} documents/min, "
+        f"{completion_tokens / wall_time if wall_time else 0:.0f} output tokens/s",
+        f"Tokens: {prompt_tokens} prompt, {completion_tokens} completion",
+    ]
+    if latencies:
+        lines.append(f"Latency: median {latencies[len(latencies) // 2]:.1f}s, max {latencies[-1]:.1f}s")
+    return "\n".join(lines)
+
+
+def positive_float(value: str) -> float:
+    number = float(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, got {value}")
+    return number
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate every document type for every audience from a folder of specs")
+    parser.add_argument("spec_dir", help="directory of .txt, .md, .pdf, .docx or .rtf spec files")
+    parser.add_argument("--doc-types", nargs="+", default=DOC_TYPES, choices=DOC_TYPES, metavar="TYPE")
+    parser.add_argument("--audiences", nargs="+", default=AUDIENCES, choices=AUDIENCES, metavar="AUDIENCE")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rpm", type=positive_float, default=60, help="requests per minute")
+    parser.add_argument("--tpm", type=positive_float, default=None, help="tokens per minute")
+    parser.add_argument("--style-guide", default=STYLE_PATH if os.path.exists(STYLE_PATH) else None)
+    parser.add_argument("--no-style-guide", action="store_true")
+    parser.add_argument("--style-budget", type=int, default=STYLE_TOKEN_BUDGET, help="style guide tokens per prompt (0 = whole guide)")
+    parser.add_argument("--docs-dir", default=DOCS_DIR)
+    parser.add_argument("--base-url", default=os.getenv("OPENAI_BASE_URL"))
+    args = parser.parse_args(argv)
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        parser.error("OPENAI_API_KEY is not set")
+
+    spec_paths = find_specs(args.spec_dir)
+    if not spec_paths:
+        parser.error(f"no spec files found in {args.spec_dir}")
+
+    style_guide = None
+    if args.style_guide and not args.no_style_guide:
+        with open(args.style_guide, "r") as f:
+            style_guide = f.read()
+
+    runner = BatchRunner(api_key, args.base_url, args.workers, args.rpm, args.tpm, style_guide, args.style_budget, args.docs_dir)
+    started = time.perf_counter()
+    results = runner.run(spec_paths, args.doc_types, args.audiences)
+    print(summarize(results, time.perf_counter() - started))
+    return 0 if all(r.error is None for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
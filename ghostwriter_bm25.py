@@ -0,0 +1,83 @@
+# ghostwriter_bm25.py
+
+from typing import Dict, Hashable, List, Tuple
+import re
+import math
+import heapq
+
+TOKEN_RE = re.compile(r"\w+")
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this to was were will with
+you your we our they their not but if then than so do does can
+""".split())
+
+# Long queries (e.g. a whole spec) are cut down to their rarest terms
+MAX_QUERY_TERMS = 64
+
+
+def tokenize(text: str) -> List[str]:
+    return [word for word in TOKEN_RE.findall(text.lower()) if word not in STOPWORDS]
+
+
+# Incremental Okapi BM25 over an inverted index. Adding or removing an entry
+# costs O(its distinct terms); a query only touches the postings of its terms.
+class BM25Index:
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[Hashable, int]] = {}
+        self.lengths: Dict[Hashable, int] = {}
+        self._terms: Dict[Hashable, Tuple[str, ...]] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.lengths
+
+    def add(self, key: Hashable, text: str):
+        if key in self.lengths:
+            self.remove(key)
+        tokens = tokenize(text)
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for term, count in counts.items():
+            self.postings.setdefault(term, {})[key] = count
+        self._terms[key] = tuple(counts)
+        self.lengths[key] = len(tokens)
+        self._total_length += len(tokens)
+
+    def remove(self, key: Hashable):
+        terms = self._terms.pop(key, None)
+        if terms is None:
+            return
+        for term in terms:
+            posting = self.postings[term]
+            del posting[key]
+            if not posting:
+                del self.postings[term]
+        self._total_length -= self.lengths.pop(key)
+
+    def idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.lengths) - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, k: int = 10, max_query_terms: int = MAX_QUERY_TERMS) -> List[Tuple[Hashable, float]]:
+        if not self.lengths:
+            return []
+        terms = {term for term in tokenize(query) if term in self.postings}
+        if len(terms) > max_query_terms:
+            terms = heapq.nsmallest(max_query_terms, terms, key=lambda term: len(self.postings[term]))
+
+        avg_length = self._total_length / len(self.lengths) or 1
+        k1, b = self.k1, self.b
+        scores: Dict[Hashable, float] = {}
+        for term in terms:
+            idf = self.idf(term)
+            for key, tf in self.postings[term].items():
+                norm = k1 * (1 - b + b * self.lengths[key] / avg_length)
+                scores[key] = scores.get(key, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
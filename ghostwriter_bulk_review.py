@@ -0,0 +1,248 @@
+# ghostwriter_bulk_review.py
+#
+# Reviews a folder of drafts, or the whole docs/ library, against a frozen
+# copy of a workspace's style model and prints one aggregated report.
+#
+#   python ghostwriter_bulk_review.py drafts/ --workers 8
+#   python ghostwriter_bulk_review.py --library --tenant docs-team --json report.json
+
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from ghostwriter_extract import extract_file
+from ghostwriter_library import DOCS_DIR, count_documents, list_documents, load_document
+from ghostwriter_metrics import span
+from ghostwriter_review import CATEGORIES, SnapshotReviewer, StyleSnapshot
+from ghostwriter_doc_learning import Workspace
+from ghostwriter_tenants import DEFAULT_TENANT, SNAPSHOT_ERRORS, TENANTS_DIR, snapshot_path, tenant_name
+
+REVIEW_EXTENSIONS = {"txt", "md", "pdf", "docx", "rtf"}
+BULK_WORKERS = max(1, os.cpu_count() or 1)
+
+# Tasks handed to a worker at a time: large enough to amortize the IPC,
+# small enough that one slow batch doesn't leave the other workers idle
+TASKS_PER_WORKER = 4
+
+# Findings shown in the report's "most common" list
+TOP_FINDINGS = 20
+
+
+class ReviewSource(NamedTuple):
+    kind: str  # 'file', 'library' or 'text'
+    name: str
+    ref: str   # file path, library document id, or the text itself
+
+
+class FileReview(NamedTuple):
+    name: str
+    words: int
+    findings: List[Tuple[str, str, str, int, int]]  # (category, key, message, line, count)
+    seconds: float
+    error: Optional[str]
+
+
+def find_documents(directory: str) -> List[ReviewSource]:
+    sources = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for filename in sorted(files):
+            if filename.rsplit(".", 1)[-1].lower() in REVIEW_EXTENSIONS:
+                path = os.path.join(root, filename)
+                sources.append(ReviewSource("file", os.path.relpath(path, directory), path))
+    return sources
+
+
+def library_documents(docs_dir: str = DOCS_DIR) -> List[ReviewSource]:
+    documents = list_documents(count_documents(docs_dir), 0, docs_dir)
+    return [ReviewSource("library", doc["name"], doc["id"]) for doc in documents]
+
+
+# Per-process state, set once by _init_worker so tasks only carry their source
+_reviewer: Optional[SnapshotReviewer] = None
+_docs_dir = DOCS_DIR
+
+
+def _init_worker(snapshot: StyleSnapshot, docs_dir: str):
+    global _reviewer, _docs_dir
+    _reviewer = SnapshotReviewer(snapshot)
+    _docs_dir = docs_dir
+
+
+def _read(source: ReviewSource) -> str:
+    if source.kind == "file":
+        # The files are already spread over the pool; a PDF pool per worker would oversubscribe the CPUs
+        return extract_file(source.ref, parallel=False)
+    if source.kind == "library":
+        doc = load_document(source.ref, _docs_dir)
+        if doc is None:
+            raise KeyError(f"Library document {source.ref} no longer exists")
+        return doc["content"]
+    return source.ref
+
+
+# Runs in a worker process
+def _review_source(source: ReviewSource) -> FileReview:
+    started = time.perf_counter()
+    try:
+        text = _read(source)
+        summary = _reviewer.review(text)
+    except Exception as e:
+        return FileReview(source.name, 0, [], time.perf_counter() - started, f"{e.__class__.__name__}: {e}")
+    findings = [
+        (category, key, finding.message, finding.line, count)
+        for category in CATEGORIES
+        for key, (finding, count) in summary.entries[category].items()
+    ]
+    return FileReview(source.name, len(text.split()), findings, time.perf_counter() - started, None)
+
+
+# Fans the sources out over a process pool that receives the snapshot once
+# per worker. Results come back in source order.
+def review_sources(snapshot: StyleSnapshot, sources: List[ReviewSource], workers: int = BULK_WORKERS,
+                   docs_dir: str = DOCS_DIR, progress: Optional[Callable[[int, int], None]] = None) -> List[FileReview]:
+    reviews = []
+    with span("bulk_review"):
+        if workers <= 1 or len(sources) <= 1:
+            _init_worker(snapshot, docs_dir)
+            results = map(_review_source, sources)
+            pool = None
+        else:
+            # spawn: forking a threaded server process is not safe
+            pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker, initargs=(snapshot, docs_dir),
+            )
+            chunksize = max(1, len(sources) // (workers * TASKS_PER_WORKER))
+            results = pool.map(_review_source, sources, chunksize=chunksize)
+        try:
+            for review in results:
+                reviews.append(review)
+                if progress is not None:
+                    progress(len(reviews), len(sources))
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+    return reviews
+
+
+# One report over every reviewed file
+class BulkReport:
+    def __init__(self, reviews: List[FileReview], wall_time: float):
+        self.reviews = reviews
+        self.wall_time = wall_time
+        self.failed = [r for r in reviews if r.error is not None]
+        self.words = sum(r.words for r in reviews)
+        self.totals = Counter()
+        # key -> [category, message, files, occurrences]
+        self.common: Dict[str, List] = {}
+        for review in reviews:
+            for category, key, message, _, count in review.findings:
+                self.totals[category] += count
+                entry = self.common.setdefault(key, [category, message, 0, 0])
+                entry[2] += 1
+                entry[3] += count
+
+    def most_common(self, limit: int = TOP_FINDINGS) -> List[List]:
+        return sorted(self.common.values(), key=lambda entry: (-entry[2], -entry[3], entry[1]))[:limit]
+
+    def as_dict(self) -> Dict:
+        return {
+            "files": len(self.reviews),
+            "failed": len(self.failed),
+            "words": self.words,
+            "wall_time": self.wall_time,
+            "totals": {category: self.totals[category] for category in CATEGORIES},
+            "most_common": [
+                {"category": category, "message": message, "files": files, "occurrences": occurrences}
+                for category, message, files, occurrences in self.most_common()
+            ],
+            "documents": [
+                {
+                    "name": review.name,
+                    "words": review.words,
+                    "error": review.error,
+                    "findings": [
+                        {"category": category, "message": message, "line": line, "count": count}
+                        for category, _, message, line, count in review.findings
+                    ],
+                }
+                for review in self.reviews
+            ],
+        }
+
+    def as_text(self) -> str:
+        lines = [
+            f"Documents: {len(self.reviews) - len(self.failed)} reviewed, {len(self.failed)} failed",
+            f"Words: {self.words} in {self.wall_time:.1f}s ({self.words / self.wall_time if self.wall_time else 0:.0f} words/s)",
+            "Findings: " + ", ".join(f"{self.totals[category]} {category}" for category in CATEGORIES),
+        ]
+        if self.common:
+            lines.append("\nMost common:")
+            for category, message, files, occurrences in self.most_common():
+                lines.append(f"  [{category}] {message} — {files} documents, {occurrences} times")
+        lines.append("\nBy document:")
+        for review in self.reviews:
+            if review.error is not None:
+                lines.append(f"  {review.name}: FAILED ({review.error})")
+                continue
+            counts = Counter()
+            for category, _, _, _, count in review.findings:
+                counts[category] += count
+            summary = ", ".join(f"{counts[category]} {category}" for category in CATEGORIES if counts[category]) or "no issues"
+            lines.append(f"  {review.name}: {summary}")
+        return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Review a folder of drafts or the docs/ library against a workspace's style model")
+    parser.add_argument("directory", nargs="?", help="folder of .txt, .md, .pdf, .docx or .rtf files (searched recursively)")
+    parser.add_argument("--library", action="store_true", help="review every document in the library")
+    parser.add_argument("--docs-dir", default=DOCS_DIR)
+    parser.add_argument("--tenant", default=os.getenv("GHOSTWRITER_TENANT", DEFAULT_TENANT), help="workspace whose style model is used")
+    parser.add_argument("--tenants-dir", default=TENANTS_DIR)
+    parser.add_argument("--workers", type=int, default=BULK_WORKERS)
+    parser.add_argument("--json", metavar="PATH", help="also write the full report as JSON")
+    args = parser.parse_args(argv)
+
+    if not args.directory and not args.library:
+        parser.error("give a directory, --library, or both")
+
+    # Read the snapshot directly: unlike Tenant, this never moves a bad file
+    # aside, so it is safe to run against a live server's workspace
+    path = snapshot_path(tenant_name(args.tenant), args.tenants_dir)
+    try:
+        snapshot = Workspace.load_snapshot(path).style_snapshot()
+    except FileNotFoundError:
+        parser.error(f"no workspace snapshot at {path}")
+    except SNAPSHOT_ERRORS as e:
+        parser.error(f"cannot use the workspace snapshot at {path}: {e}")
+
+    sources = find_documents(args.directory) if args.directory else []
+    if args.library:
+        sources += library_documents(args.docs_dir)
+    if not sources:
+        parser.error("nothing to review")
+
+    def progress(done: int, total: int):
+        if done == total or done % 50 == 0:
+            print(f"[{done}/{total}] reviewed", file=sys.stderr)
+
+    started = time.perf_counter()
+    reviews = review_sources(snapshot, sources, args.workers, args.docs_dir, progress)
+    report = BulkReport(reviews, time.perf_counter() - started)
+    print(report.as_text())
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report.as_dict(), f, indent=2)
+    return 0 if not report.failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+# ghostwriter_cache.py
+
+from typing import Dict, List, Optional
+import os
+import json
+import zlib
+import hashlib
+import threading
+from collections import OrderedDict
+
+CACHE_DIR = ".ghostwriter_cache/responses"
+MEMORY_ENTRIES = 128
+MAX_DISK_BYTES = 50 * 1024 * 1024
+
+# Disk eviction trims down to this fraction of the limit so it doesn't run on every put
+EVICT_TO_FRACTION = 0.9
+
+
+# Content address for a completion: anything that changes the output changes the key
+def cache_key(model: str, messages: List[Dict[str, str]], temperature: float) -> str:
+    payload = json.dumps({"model": model, "messages": messages, "temperature": temperature}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# Two-tier LRU: an in-memory OrderedDict in front of a size-bounded directory
+# of compressed entries. File mtimes serve as the disk tier's recency clock.
+class ResponseCache:
+    def __init__(self, cache_dir: str = CACHE_DIR, memory_entries: int = MEMORY_ENTRIES, max_disk_bytes: int = MAX_DISK_BYTES):
+        self.cache_dir = cache_dir
+        self.memory_entries = memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._disk_bytes = sum(entry.stat().st_size for entry in os.scandir(cache_dir) if entry.name.endswith(".z"))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.z")
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return self._memory[key]
+
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = zlib.decompress(f.read()).decode("utf-8")
+            os.utime(path)
+        except (FileNotFoundError, zlib.error):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(key, value)
+        return value
+
+    def put(self, key: str, value: str):
+        data = zlib.compress(value.encode("utf-8"))
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        previous = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._remember(key, value)
+            self._disk_bytes += len(data) - previous
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _remember(self, key: str, value: str):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        entries = sorted(
+            (entry for entry in os.scandir(self.cache_dir) if entry.name.endswith(".z")),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        target = self.max_disk_bytes * EVICT_TO_FRACTION
+        for entry in entries:
+            if self._disk_bytes <= target:
+                break
+            size = entry.stat().st_size
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            self._disk_bytes -= size
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith(".z"):
+                    os.remove(entry.path)
+            self._disk_bytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+                "disk_bytes": self._disk_bytes,
+            }
@@ -0,0 +1,35 @@
+# ghostwriter_delta.py
+
+from typing import List, Union
+import json
+import zlib
+from difflib import SequenceMatcher
+
+# A delta is a list of ops that rebuild a target text from a source text:
+# [start, end] copies source lines start..end, a string inserts new text
+Op = Union[List[int], str]
+
+
+def make_delta(source: str, target: str) -> List[Op]:
+    a = source.splitlines(keepends=True)
+    b = target.splitlines(keepends=True)
+    ops: List[Op] = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, a, b).get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif tag in ("replace", "insert"):
+            ops.append("".join(b[j1:j2]))
+    return ops
+
+
+def apply_delta(source: str, ops: List[Op]) -> str:
+    a = source.splitlines(keepends=True)
+    return "".join(op if isinstance(op, str) else "".join(a[op[0]:op[1]]) for op in ops)
+
+
+def encode_delta(ops: List[Op]) -> bytes:
+    return zlib.compress(json.dumps(ops, separators=(",", ":")).encode("utf-8"))
+
+
+def decode_delta(blob: bytes) -> List[Op]:
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
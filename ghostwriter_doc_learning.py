@@ -1,95 +1,352 @@
 # ghostwriter_doc_learning.py
 
-from typing import List, Dict
-import os
+from typing import List, Dict, Iterator, Optional, Sequence, Tuple
 import re
+import zlib
+import pickle
+from array import array
 from collections import Counter
 from uuid import uuid4
 
-# Basic document class to represent uploaded content
+from ghostwriter_bm25 import BM25Index
+from ghostwriter_metrics import span
+from ghostwriter_minhash import DUPLICATE_THRESHOLD, LSHIndex, signature
+from ghostwriter_review import Finding, ReviewSummary, StyleSnapshot, iter_findings
+from ghostwriter_storage import atomic_write
+from ghostwriter_terms import TermMatcher
+
+# Compiled once; shared by the style model and the reviewer
+WORD_RE = re.compile(r"\b\w+\b")
+SENTENCE_SPLIT_RE = re.compile(r"[.!?]")
+PASSIVE_RE = re.compile(r"\b(is|was|were|be|been|being)\b\s+\w+ed\b")
+
+# Bumped whenever the pickled Workspace layout changes
+SNAPSHOT_VERSION = 6
+
+# Paragraphs shorter than this are headings or fragments, not useful exemplars
+MIN_EXEMPLAR_WORDS = 8
+
+# Model is built once this many final docs or total words have been uploaded
+MODEL_MIN_FINAL_DOCS = 5
+MODEL_MIN_WORDS = 10000
+
+
+# A paragraph: a line's text without its surrounding whitespace
+CHUNK_RE = re.compile(r"\S(?:[^\n]*\S)?")
+
+
+def chunk_offsets(content: str) -> array:
+    offsets = array("L")
+    for match in CHUNK_RE.finditer(content):
+        offsets.append(match.start())
+        offsets.append(match.end())
+    return offsets
+
+
+# Uploaded content. Paragraphs are (start, end) offsets into the one content
+# string rather than copies of it, and __slots__ drops the per-instance dict,
+# which adds up across tens of thousands of documents.
 class Document:
+    __slots__ = ("id", "filename", "status", "content", "_offsets", "_word_count")
+
     def __init__(self, content: str, filename: str, status: str = "draft"):
         self.id = str(uuid4())
         self.filename = filename
         self.status = status  # 'final' or 'draft'
-        self.word_count = len(content.split())
         self.content = content
-        self.chunks = self.chunk_content()
+        self._offsets = chunk_offsets(content)
+        self._word_count: Optional[int] = None
+
+    @property
+    def word_count(self) -> int:
+        if self._word_count is None:
+            self._word_count = len(self.content.split())
+        return self._word_count
+
+    @property
+    def chunk_count(self) -> int:
+        return len(self._offsets) // 2
+
+    def chunk(self, i: int) -> str:
+        return self.content[self._offsets[2 * i]:self._offsets[2 * i + 1]]
+
+    def iter_chunks(self) -> Iterator[str]:
+        content = self.content
+        pairs = iter(self._offsets)
+        for start, end in zip(pairs, pairs):
+            yield content[start:end]
+
+    @property
+    def chunks(self) -> List[str]:
+        return list(self.iter_chunks())
+
+    def __getstate__(self):
+        return self.id, self.filename, self.status, self.content, self._offsets, self._word_count
+
+    def __setstate__(self, state):
+        if isinstance(state, dict):
+            # Snapshots before version 5 pickled the instance dict with chunk copies
+            self.id, self.filename, self.status, self.content = state["id"], state["filename"], state["status"], state["content"]
+            self._offsets = chunk_offsets(self.content)
+            self._word_count = state.get("word_count")
+        else:
+            self.id, self.filename, self.status, self.content, self._offsets, self._word_count = state
+
+
+# Raised instead of ingesting a near-copy of a document already in the workspace
+class DuplicateDocumentError(ValueError):
+    def __init__(self, duplicate: Document, similarity: float):
+        super().__init__(f"Near-duplicate of '{duplicate.filename}' ({similarity:.0%} similar)")
+        self.duplicate = duplicate
+        self.similarity = similarity
+
+
+# What a single final document adds to the style model. Computed when the
+# document is added and again, from its content, when it is removed; nothing
+# here is kept per document except the passive chunk indices.
+class DocumentStats:
+    def __init__(self, doc: Document):
+        self.term_counts = Counter()
+        self.sentence_length_sum = 0
+        self.sentence_count = 0
+        self.passive_chunks = array("L")
+
+        for i, chunk in enumerate(doc.iter_chunks()):
+            lowered = chunk.lower()
+            self.term_counts.update(WORD_RE.findall(lowered))
+            for sentence in SENTENCE_SPLIT_RE.split(chunk):
+                if sentence.strip():
+                    self.sentence_length_sum += len(WORD_RE.findall(sentence))
+                    self.sentence_count += 1
+            if PASSIVE_RE.search(lowered):
+                self.passive_chunks.append(i)
+
 
-    def chunk_content(self) -> List[str]:
-        # Basic chunking into paragraphs
-        return [p.strip() for p in self.content.split("\n") if p.strip()]
+# The passive-voice paragraphs of the final documents, read like a list.
+# Holds (document, chunk indices) pairs and slices paragraphs out on access,
+# so building the model copies no text. Later uploads don't change it.
+class PassiveMarkers(Sequence):
+    __slots__ = ("_entries", "_length")
+
+    def __init__(self, entries: Tuple[Tuple[Document, array], ...]):
+        self._entries = entries
+        self._length = sum(len(indices) for _, indices in entries)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._length))]
+        if i < 0:
+            i += self._length
+        if not 0 <= i < self._length:
+            raise IndexError("passive marker index out of range")
+        for doc, indices in self._entries:
+            if i < len(indices):
+                return doc.chunk(indices[i])
+            i -= len(indices)
+
+    def __iter__(self) -> Iterator[str]:
+        for doc, indices in self._entries:
+            for i in indices:
+                yield doc.chunk(i)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Sequence) and list(self) == list(other)
 
 
 # Core workspace model
 class Workspace:
     def __init__(self):
         self.documents: List[Document] = []
+        self._documents_by_id: Dict[str, Document] = {}
         self.preferred_terms: Dict[str, str] = {}
+        self.term_matcher = TermMatcher()
+        # BM25 over the paragraphs of final documents, keyed by (doc id, chunk index)
+        self.chunk_index = BM25Index()
+        # MinHash/LSH fingerprints of every document, keyed by doc id
+        self.duplicate_index = LSHIndex()
         self.model_ready = False
         self.style_model = {}
         self.term_frequencies = Counter()
 
-    def upload_document(self, content: str, filename: str, status: str = "draft"):
-        doc = Document(content, filename, status)
-        self.documents.append(doc)
+        # Running aggregates over final documents; a document's share is
+        # recomputed from its content to subtract it again, in O(its size)
+        self._sentence_length_sum = 0
+        self._sentence_count = 0
+        # doc id -> indices of its passive-voice chunks
+        self._passive_markers: Dict[str, array] = {}
+        self._final_count = 0
+        self._total_words = 0
+
+    def upload_document(self, content: str, filename: str, status: str = "draft",
+                        allow_duplicates: bool = False) -> Document:
+        with span("ingest"):
+            sig = signature(content)
+            if not allow_duplicates:
+                matches = self.duplicate_index.query(sig)
+                if matches:
+                    doc_id, similarity = matches[0]
+                    raise DuplicateDocumentError(self.get_document(doc_id), similarity)
+            doc = Document(content, filename, status)
+            self.duplicate_index.add(doc.id, sig)
+            self.documents.append(doc)
+            self._documents_by_id[doc.id] = doc
+            self._total_words += doc.word_count
+            if doc.status == "final":
+                self._add_contribution(doc)
+            self.check_model_trigger()
+            return doc
+
+    def get_document(self, doc_id: str) -> Optional[Document]:
+        return self._documents_by_id.get(doc_id)
+
+    # Uploaded documents at least `threshold` similar to the text, most similar first
+    def find_duplicates(self, content: str, threshold: float = DUPLICATE_THRESHOLD) -> List[Tuple[Document, float]]:
+        return [(self.get_document(doc_id), sim) for doc_id, sim in self.duplicate_index.query(signature(content), threshold)]
+
+    def remove_document(self, doc_id: str):
+        doc = self.get_document(doc_id)
+        if doc is None:
+            return
+        self.documents.remove(doc)
+        del self._documents_by_id[doc_id]
+        self.duplicate_index.remove(doc_id)
+        self._total_words -= doc.word_count
+        if doc.status == "final":
+            self._remove_contribution(doc)
+        self.check_model_trigger()
+
+    def set_document_status(self, doc_id: str, status: str):
+        doc = self.get_document(doc_id)
+        if doc is None or doc.status == status:
+            return
+        if doc.status == "final":
+            self._remove_contribution(doc)
+        doc.status = status
+        if doc.status == "final":
+            self._add_contribution(doc)
         self.check_model_trigger()
 
+    # Variants may be single words or phrases ("power cord" -> "power cable")
     def mark_preferred_term(self, variant: str, preferred: str):
-        self.preferred_terms[variant.lower()] = preferred.lower()
+        key = self.term_matcher.add(variant, preferred.lower())
+        self.preferred_terms[key] = preferred.lower()
 
     def check_model_trigger(self):
-        final_docs = [doc for doc in self.documents if doc.status == "final"]
-        total_words = sum(doc.word_count for doc in self.documents)
-        if len(final_docs) >= 5 or total_words >= 10000:
+        if self._final_count >= MODEL_MIN_FINAL_DOCS or self._total_words >= MODEL_MIN_WORDS:
             self.build_model()
+        else:
+            self.model_ready = False
 
+    def _add_contribution(self, doc: Document):
+        stats = DocumentStats(doc)
+        self.term_frequencies.update(stats.term_counts)
+        self._sentence_length_sum += stats.sentence_length_sum
+        self._sentence_count += stats.sentence_count
+        if stats.passive_chunks:
+            self._passive_markers[doc.id] = stats.passive_chunks
+        for i, chunk in enumerate(doc.iter_chunks()):
+            if len(chunk.split()) >= MIN_EXEMPLAR_WORDS:
+                self.chunk_index.add((doc.id, i), chunk)
+        self._final_count += 1
+
+    def _remove_contribution(self, doc: Document):
+        stats = DocumentStats(doc)
+        for term, count in stats.term_counts.items():
+            remaining = self.term_frequencies[term] - count
+            if remaining > 0:
+                self.term_frequencies[term] = remaining
+            else:
+                del self.term_frequencies[term]
+        self._sentence_length_sum -= stats.sentence_length_sum
+        self._sentence_count -= stats.sentence_count
+        self._passive_markers.pop(doc.id, None)
+        for i in range(doc.chunk_count):
+            self.chunk_index.remove((doc.id, i))
+        self._final_count -= 1
+
+    # Approved paragraphs most similar to the text, for use as style exemplars
+    def similar_chunks(self, text: str, k: int = 3) -> List[str]:
+        chunks = []
+        for (doc_id, i), _ in self.chunk_index.search(text, k):
+            doc = self.get_document(doc_id)
+            if doc is not None:
+                chunks.append(doc.chunk(i))
+        return chunks
+
+    # Reads the running aggregates; no document is re-tokenized here
     def build_model(self):
-        term_counter = Counter()
-        all_chunks = []
+        with span("build_model"):
+            self.model_ready = True
+            self.style_model = {
+                "avg_sentence_length": self._average_sentence_length(),
+                # Reads as a flat list, as before, without copying the paragraphs
+                "passive_voice_markers": PassiveMarkers(tuple(
+                    (self._documents_by_id[doc_id], indices) for doc_id, indices in self._passive_markers.items()
+                )),
+            }
 
-        for doc in self.documents:
-            if doc.status == "final":
-                all_chunks.extend(doc.chunks)
-                for chunk in doc.chunks:
-                    words = re.findall(r"\\b\\w+\\b", chunk.lower())
-                    term_counter.update(words)
-
-        self.term_frequencies = term_counter
-        self.model_ready = True
-        self.style_model = {
-            "avg_sentence_length": self._average_sentence_length(all_chunks),
-            "passive_voice_markers": self._passive_voice_scan(all_chunks)
-        }
-
-    def _average_sentence_length(self, chunks: List[str]) -> float:
-        sentence_lengths = [len(re.findall(r"\\w+", s)) for chunk in chunks for s in re.split(r"[.!?]", chunk) if s.strip()]
-        return sum(sentence_lengths) / len(sentence_lengths) if sentence_lengths else 0
-
-    def _passive_voice_scan(self, chunks: List[str]) -> List[str]:
-        passive_markers = []
-        for chunk in chunks:
-            if re.search(r"\\b(is|was|were|be|been|being)\\b\\s+\\w+ed\\b", chunk.lower()):
-                passive_markers.append(chunk)
-        return passive_markers
+    def _average_sentence_length(self) -> float:
+        return self._sentence_length_sum / self._sentence_count if self._sentence_count else 0
 
-    def review_document(self, content: str) -> Dict[str, List[str]]:
-        feedback = {"tone": [], "structure": [], "terminology": []}
+    # Snapshot: zlib-compressed pickle of the full state, including the term
+    # counts and style model, so loading never re-learns the corpus
+    def dump_snapshot(self) -> bytes:
+        payload = pickle.dumps({"version": SNAPSHOT_VERSION, "state": self.__dict__}, protocol=pickle.HIGHEST_PROTOCOL)
+        return zlib.compress(payload, 1)
+
+    def save_snapshot(self, path: str):
+        atomic_write(path, self.dump_snapshot())
+
+    @classmethod
+    def load_snapshot(cls, path: str) -> "Workspace":
+        with open(path, "rb") as f:
+            snapshot = pickle.loads(zlib.decompress(f.read()))
+        version = snapshot.get("version")
+        # Versions 3 to 5 differ only in derived data, rebuilt below and in Document.__setstate__
+        if version not in (3, 4, 5, SNAPSHOT_VERSION):
+            raise ValueError(f"Unsupported workspace snapshot version: {version}")
+        workspace = cls.__new__(cls)
+        workspace.__dict__.update(snapshot["state"])
+        if version < 6:
+            # Before version 6 each final document kept its term counts and
+            # passive paragraphs as text; only the paragraph indices are kept now
+            workspace.__dict__.pop("_doc_stats", None)
+            workspace._passive_markers = {}
+            for doc_id in snapshot["state"].get("_passive_markers", {}):
+                doc = workspace._documents_by_id[doc_id]
+                indices = array("L", (i for i, chunk in enumerate(doc.iter_chunks()) if PASSIVE_RE.search(chunk.lower())))
+                if indices:
+                    workspace._passive_markers[doc_id] = indices
+            if workspace.model_ready:
+                workspace.build_model()
+        if version == 3:
+            # Version 3 predates duplicate detection: fingerprint the stored documents
+            workspace.duplicate_index = LSHIndex()
+            for doc in workspace.documents:
+                workspace.duplicate_index.add(doc.id, signature(doc.content))
+        return workspace
+
+    def iter_review(self, content: str) -> Iterator[Finding]:
+        if not self.model_ready:
+            return iter(())
+        return iter_findings(content, self.style_model["avg_sentence_length"], self.term_matcher, self.term_frequencies)
+
+    # Frozen copy of what review reads, for reviewing outside this process
+    def style_snapshot(self) -> StyleSnapshot:
         if not self.model_ready:
-            return feedback
-
-        sentences = re.split(r"(?<=[.!?])\s+", content)
-        for sentence in sentences:
-            word_count = len(re.findall(r"\\w+", sentence))
-            if word_count > self.style_model["avg_sentence_length"] * 1.5:
-                feedback["structure"].append(f"Long sentence: {sentence.strip()}")
-            if re.search(r"\\b(is|was|were|be|been|being)\\b\\s+\\w+ed\\b", sentence.lower()):
-                feedback["tone"].append(f"Passive voice: {sentence.strip()}")
-
-        for word in re.findall(r"\\b\\w+\\b", content):
-            if word.lower() in self.preferred_terms:
-                feedback["terminology"].append(f"Use '{self.preferred_terms[word.lower()]}' instead of '{word}'")
-            elif word.lower() in self.term_frequencies and self.term_frequencies[word.lower()] < 2:
-                feedback["terminology"].append(f"Infrequent term: '{word}'")
-
-        return feedback
+            raise ValueError("The style model is not built yet; upload more final documents first")
+        return StyleSnapshot(
+            self.style_model["avg_sentence_length"],
+            frozenset(term for term, count in self.term_frequencies.items() if count == 1),
+            tuple(self.preferred_terms.items()),
+        )
+
+    def review_document(self, content: str) -> Dict[str, List[str]]:
+        summary = ReviewSummary()
+        with span("review"):
+            for finding in self.iter_review(content):
+                summary.add(finding)
+        return summary.as_feedback()
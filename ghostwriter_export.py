@@ -0,0 +1,261 @@
+# ghostwriter_export.py
+
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO
+import os
+import sys
+import json
+import shutil
+import hashlib
+import argparse
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from ghostwriter_generation import estimate_tokens, split_sections
+from ghostwriter_metrics import span
+from ghostwriter_sections import parse_sections
+from ghostwriter_storage import atomic_open, atomic_write
+
+PDF_CACHE_DIR = ".ghostwriter_cache/pdf"
+PDF_WORKERS = 2
+PDF_CACHE_MAX_FILES = 200
+PANDOC_TIMEOUT = 120
+
+
+def content_hash(markdown: str) -> str:
+    return hashlib.sha256(markdown.encode("utf-8")).hexdigest()
+
+
+# Runs pandoc on a small thread pool (the work happens in the subprocess) and
+# keeps finished PDFs on disk keyed by the hash of their Markdown
+class PdfExporter:
+    def __init__(self, cache_dir: str = PDF_CACHE_DIR, workers: int = PDF_WORKERS, max_files: int = PDF_CACHE_MAX_FILES):
+        self.cache_dir = cache_dir
+        self.max_files = max_files
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pdf-export")
+        self._jobs: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pdf")
+
+    def cached_path(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        return path if os.path.exists(path) else None
+
+    # Starts a conversion unless the PDF is already cached or being built
+    def submit(self, markdown: str) -> str:
+        key = content_hash(markdown)
+        with self._lock:
+            job = self._jobs.get(key)
+            if self.cached_path(key) or (job is not None and not job.done()):
+                return key
+            # Forget finished jobs; their PDFs are on disk (or they failed and are being retried)
+            for done_key in [k for k, j in self._jobs.items() if j.done() and j.exception() is None]:
+                del self._jobs[done_key]
+            self._jobs[key] = self._pool.submit(self._convert, markdown, key)
+        return key
+
+    # 'ready', 'running', 'failed' or None when never requested. A finished
+    # conversion whose PDF has since been pruned counts as never requested.
+    def status(self, key: str) -> Optional[str]:
+        if self.cached_path(key):
+            return "ready"
+        with self._lock:
+            job = self._jobs.get(key)
+        if job is None:
+            return None
+        if not job.done():
+            return "running"
+        return "failed" if job.exception() is not None else None
+
+    def error(self, key: str) -> Optional[BaseException]:
+        with self._lock:
+            job = self._jobs.get(key)
+        return job.exception() if job is not None and job.done() else None
+
+    def _convert(self, markdown: str, key: str) -> str:
+        # Everything pandoc touches lives in a temp dir that is always removed
+        with tempfile.TemporaryDirectory(prefix="ghostwriter-pdf-") as tmp:
+            md_path = os.path.join(tmp, "draft.md")
+            pdf_path = os.path.join(tmp, "draft.pdf")
+            with open(md_path, "w") as f:
+                f.write(markdown)
+            try:
+                with span("pdf_export"):
+                    subprocess.run(["pandoc", md_path, "-o", pdf_path], check=True, capture_output=True, timeout=PANDOC_TIMEOUT)
+            except subprocess.CalledProcessError as e:
+                raise RuntimeError(f"pandoc exited with {e.returncode}: {e.stderr.decode(errors='replace').strip()}") from e
+            # The temp dir may be on another filesystem: move next to the cache, then rename into place
+            staging_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+            shutil.move(pdf_path, staging_path)
+            os.replace(staging_path, self._path(key))
+        self._prune()
+        return self._path(key)
+
+    # max_files=0 keeps every PDF
+    def _prune(self):
+        if self.max_files <= 0:
+            return
+        entries = sorted(
+            (entry for entry in os.scandir(self.cache_dir) if entry.name.endswith(".pdf")),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in entries[:max(0, len(entries) - self.max_files)]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+# --- Chatbot export (JSONL) ---
+# One record per heading-scoped chunk, ready for a retrieval index. Headings
+# down to H3 start a chunk; longer chunks are split at paragraph breaks.
+EXPORT_HEADING_LEVEL = 3
+CHUNK_TOKEN_BUDGET = 400
+MANIFEST_VERSION = 1
+
+# Document fields copied onto every record; a change to any of them re-emits
+# all of the document's chunks
+RECORD_FIELDS = ("name", "type", "audience", "date", "tags")
+
+
+def _digest(*parts: str) -> str:
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+# IDs depend on the document, the heading path and the chunk's place under
+# it, not its position in the document: inserting a section leaves the IDs
+# of every other chunk unchanged
+def chunk_records(doc: Dict) -> Iterator[Dict]:
+    path: List[str] = []
+    seen: Dict[str, int] = {}
+    for section in parse_sections(doc["content"], EXPORT_HEADING_LEVEL):
+        if section.level:
+            path = path[:section.level - 1] + [""] * (section.level - 1 - len(path)) + [section.title]
+            body = section.text.split("\n", 1)[1] if "\n" in section.text else ""
+        else:
+            body = section.text
+        headings = [heading for heading in path if heading]
+        anchor = " > ".join(headings)
+        seen[anchor] = seen.get(anchor, 0) + 1
+        for part, text in enumerate(split_sections(body, CHUNK_TOKEN_BUDGET)):
+            yield {
+                "id": f"{doc['id']}:{_digest(anchor, str(seen[anchor]), str(part))[:16]}",
+                "doc_id": doc["id"],
+                **{field: doc.get(field) for field in RECORD_FIELDS},
+                "headings": headings,
+                "text": text,
+                "tokens": estimate_tokens(text),
+                "content_hash": _digest(text),
+            }
+
+
+class ExportStats:
+    def __init__(self):
+        self.documents = 0
+        self.upserts = 0
+        self.deletes = 0
+        self.unchanged = 0
+
+    def as_dict(self) -> Dict:
+        return {"documents": self.documents, "upserts": self.upserts, "deletes": self.deletes, "unchanged": self.unchanged}
+
+
+# Writes JSONL records as it reads documents, one document at a time. With a
+# manifest (record ID -> content hash per document, from the last export)
+# only new or changed chunks are written as "upsert", and chunks that are
+# gone as "delete"; without one every chunk is written.
+class ChatbotExporter:
+    def __init__(self, manifest_path: Optional[str] = None):
+        self.manifest_path = manifest_path
+        self.documents: Dict[str, Dict] = {}
+        if manifest_path is not None and os.path.exists(manifest_path):
+            with open(manifest_path, "r") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == MANIFEST_VERSION:
+                self.documents = manifest["documents"]
+
+    def export(self, documents: Iterable[Dict], out: TextIO) -> ExportStats:
+        stats = ExportStats()
+        previous, self.documents = self.documents, {}
+
+        def write(record: Dict):
+            out.write(json.dumps(record, ensure_ascii=False))
+            out.write("\n")
+
+        with span("chatbot_export"):
+            for doc in documents:
+                stats.documents += 1
+                fields = _digest(json.dumps([doc.get(field) for field in RECORD_FIELDS], ensure_ascii=False))
+                old = previous.pop(doc["id"], None)
+                old_chunks = old["chunks"] if old is not None and old["fields"] == fields else {}
+                chunks = {}
+                for record in chunk_records(doc):
+                    short_hash = record["content_hash"][:16]
+                    chunks[record["id"]] = short_hash
+                    if old_chunks.get(record["id"]) == short_hash:
+                        stats.unchanged += 1
+                        continue
+                    write({"op": "upsert", **record})
+                    stats.upserts += 1
+                if old is not None:
+                    for chunk_id in old["chunks"].keys() - chunks.keys():
+                        write({"op": "delete", "id": chunk_id, "doc_id": doc["id"]})
+                        stats.deletes += 1
+                self.documents[doc["id"]] = {"fields": fields, "chunks": chunks}
+
+            # Documents that were exported before and no longer exist
+            for doc_id, old in previous.items():
+                for chunk_id in old["chunks"]:
+                    write({"op": "delete", "id": chunk_id, "doc_id": doc_id})
+                    stats.deletes += 1
+        return stats
+
+    # Call once the export has been written, so a failed run is redone in full next time
+    def save_manifest(self):
+        if self.manifest_path is not None:
+            atomic_write(self.manifest_path, json.dumps({"version": MANIFEST_VERSION, "documents": self.documents}))
+
+    def export_file(self, documents: Iterable[Dict], path: str) -> ExportStats:
+        with atomic_open(path, "w") as out:
+            stats = self.export(documents, out)
+        self.save_manifest()
+        return stats
+
+
+# All records for one document, e.g. a draft that hasn't been saved yet
+def export_jsonl(doc: Dict) -> str:
+    return "".join(json.dumps({"op": "upsert", **record}, ensure_ascii=False) + "\n" for record in chunk_records(doc))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from ghostwriter_library import DOCS_DIR, iter_documents
+
+    parser = argparse.ArgumentParser(description="Export the document library (or Markdown files) as chatbot-ready JSONL")
+    parser.add_argument("output", help="JSONL file to write")
+    parser.add_argument("--manifest", help="manifest from the last export; only changed chunks are written, and it is updated")
+    parser.add_argument("--docs-dir", default=DOCS_DIR)
+    parser.add_argument("--files", nargs="+", metavar="MARKDOWN", help="export these Markdown files instead of the library")
+    args = parser.parse_args(argv)
+
+    if args.files:
+        def documents():
+            for path in args.files:
+                with open(path, "r") as f:
+                    content = f.read()
+                # Stable across runs: the file path, not a fresh UUID, identifies the document
+                yield {"id": _digest(os.path.abspath(path))[:32], "name": os.path.splitext(os.path.basename(path))[0], "content": content}
+        source = documents()
+    else:
+        source = iter_documents(args.docs_dir)
+
+    stats = ChatbotExporter(args.manifest).export_file(source, args.output)
+    print(f"{stats.documents} documents: {stats.upserts} chunks written, {stats.deletes} deleted, {stats.unchanged} unchanged", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
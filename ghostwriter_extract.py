@@ -0,0 +1,122 @@
+# ghostwriter_extract.py
+
+from typing import Iterator, List
+import io
+import os
+import hashlib
+import tempfile
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+CACHE_ENTRIES = 64
+
+# PDFs with at least this many pages are split into page ranges across a process pool
+PARALLEL_MIN_PAGES = 40
+PAGES_PER_TASK = 20
+PDF_WORKERS = max(1, min(4, (os.cpu_count() or 1)))
+
+# Extracted parts (pages or paragraphs) keyed by content hash
+_cache: "OrderedDict[str, List[str]]" = OrderedDict()
+_cache_lock = threading.Lock()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def file_extension(filename: str) -> str:
+    return filename.rsplit(".", 1)[-1].lower()
+
+
+def content_key(filename: str, data: bytes) -> str:
+    return f"{file_extension(filename)}:{hashlib.sha256(data).hexdigest()}"
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a threaded server process is not safe
+            _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+# Runs in a worker process
+def _extract_page_range(path: str, start: int, stop: int) -> List[str]:
+    import fitz  # PyMuPDF
+    with fitz.open(path) as pdf:
+        return [pdf[i].get_text() for i in range(start, stop)]
+
+
+def _iter_pdf_pages(data: bytes, parallel: bool = True) -> Iterator[str]:
+    import fitz  # PyMuPDF
+    with fitz.open(stream=data, filetype="pdf") as pdf:
+        page_count = pdf.page_count
+        if not parallel or page_count < PARALLEL_MIN_PAGES or PDF_WORKERS == 1:
+            for page in pdf:
+                yield page.get_text()
+            return
+
+    # Workers open the PDF from a temp file instead of receiving the bytes per task
+    with tempfile.TemporaryDirectory(prefix="ghostwriter-extract-") as tmp:
+        path = os.path.join(tmp, "source.pdf")
+        with open(path, "wb") as f:
+            f.write(data)
+        ranges = [(start, min(start + PAGES_PER_TASK, page_count)) for start in range(0, page_count, PAGES_PER_TASK)]
+        futures = [_get_pool().submit(_extract_page_range, path, start, stop) for start, stop in ranges]
+        try:
+            for future in futures:
+                yield from future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def _iter_parts(filename: str, data: bytes, parallel: bool = True) -> Iterator[str]:
+    ext = file_extension(filename)
+    if ext == "pdf":
+        return _iter_pdf_pages(data, parallel)
+    if ext == "docx":
+        import docx  # python-docx for .docx handling
+        return (p.text for p in docx.Document(io.BytesIO(data)).paragraphs)
+    return iter([data.decode("utf-8")])
+
+
+# Streams the text of an uploaded file part by part (pages for PDFs,
+# paragraphs for .docx). A complete pass is cached by content hash.
+# parallel=False keeps large PDFs in this process, for callers that are
+# already pool workers.
+def iter_text(filename: str, data: bytes, parallel: bool = True) -> Iterator[str]:
+    key = content_key(filename, data)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+    if cached is not None:
+        yield from cached
+        return
+
+    parts = []
+    for part in _iter_parts(filename, data, parallel):
+        parts.append(part)
+        yield part
+
+    with _cache_lock:
+        _cache[key] = parts
+        while len(_cache) > CACHE_ENTRIES:
+            _cache.popitem(last=False)
+
+
+# Pages are joined as-is; .docx paragraphs one per line
+def join_parts(filename: str, parts: List[str]) -> str:
+    separator = "\n" if file_extension(filename) == "docx" else ""
+    return separator.join(parts)
+
+
+def extract_text(filename: str, data: bytes, parallel: bool = True) -> str:
+    return join_parts(filename, list(iter_text(filename, data, parallel)))
+
+
+def extract_file(path: str, parallel: bool = True) -> str:
+    with open(path, "rb") as f:
+        return extract_text(os.path.basename(path), f.read(), parallel)
@@ -0,0 +1,245 @@
+# ghostwriter_generation.py
+
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Iterator, List, Optional
+import re
+import time
+import asyncio
+import threading
+
+from ghostwriter_ratelimit import EXPECTED_OUTPUT_TOKENS
+
+# openai takes about half a second to import; it is loaded by the first client
+if TYPE_CHECKING:
+    import openai
+
+MODEL = "gpt-4o-mini"
+TEMPERATURE = 0.4
+
+DOC_TYPES = ["Quick Start", "Install Guide", "Safety Sheet", "FAQ"]
+AUDIENCES = ["End User", "Technician", "Support Staff"]
+
+# Specs estimated above CONTEXT_TOKEN_BUDGET go through map_reduce_draft,
+# split into sections of at most SECTION_TOKEN_BUDGET tokens
+CONTEXT_TOKEN_BUDGET = 12000
+SECTION_TOKEN_BUDGET = 3000
+MAX_CONCURRENCY = 4
+MAX_REDUCE_ROUNDS = 3
+
+# Rough English average; good enough for budgeting without a tokenizer
+CHARS_PER_TOKEN = 4
+
+
+# --- Prompt construction (shared by the Streamlit app and headless callers) ---
+def build_system_prompt(doc_type: str, audience: str, style_guide: Optional[str] = None,
+                        exemplars: Optional[List[str]] = None) -> str:
+    base_prompt = f"""
+You are a technical writer with all the experience and expertise of a 20 year career professional. Generate a professional {doc_type} for {audience}.
+Use Markdown format, H1/H2, bullets or numbers, avoid repetition and marketing fluff. Be direct and helpful. 
+"""
+    if style_guide is not None:
+        base_prompt += f"\nStrictly follow this additional style guide:\n{style_guide}"
+    if exemplars:
+        examples = "\n---\n".join(exemplars)
+        base_prompt += f"\nMatch the voice and terminology of these approved paragraphs from earlier documents (do not copy their facts):\n---\n{examples}\n---"
+    return base_prompt
+
+
+def build_user_input(doc_type: str, audience: str, product_info: str) -> str:
+    return f"""DOCUMENT TYPE: {doc_type}
+AUDIENCE: {audience}
+PRODUCT INFO:
+{product_info}
+"""
+
+
+def build_messages(doc_type: str, audience: str, product_info: str, style_guide: Optional[str] = None,
+                   exemplars: Optional[List[str]] = None) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": build_system_prompt(doc_type, audience, style_guide, exemplars)},
+        {"role": "user", "content": build_user_input(doc_type, audience, product_info)},
+    ]
+
+
+# base_url lets the app run against any OpenAI-compatible server,
+# e.g. tools/fake_openai_server.py during development
+def make_client(api_key: str, base_url: Optional[str] = None, max_retries: int = 2) -> "openai.OpenAI":
+    import openai
+    return openai.OpenAI(api_key=api_key, base_url=base_url, max_retries=max_retries)
+
+
+def make_async_client(api_key: str, base_url: Optional[str] = None, max_retries: int = 2) -> "openai.AsyncOpenAI":
+    import openai
+    return openai.AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=max_retries)
+
+
+# Timings for one generation request, in seconds
+class GenerationStats:
+    def __init__(self):
+        self.time_to_first_token: Optional[float] = None
+        self.total_latency: Optional[float] = None
+        self.chunks = 0
+        self.characters = 0
+        self.cancelled = False
+        self.cached = False
+        self.sections = 1
+
+    def as_dict(self) -> Dict:
+        return {
+            "time_to_first_token": self.time_to_first_token,
+            "total_latency": self.total_latency,
+            "chunks": self.chunks,
+            "characters": self.characters,
+            "cancelled": self.cancelled,
+            "cached": self.cached,
+            "sections": self.sections,
+        }
+
+
+def generate_draft(client: "openai.OpenAI", messages: List[Dict[str, str]], stats: Optional[GenerationStats] = None,
+                   model: str = MODEL, temperature: float = TEMPERATURE) -> str:
+    started = time.perf_counter()
+    response = client.chat.completions.create(model=model, messages=messages, temperature=temperature)
+    draft = response.choices[0].message.content
+    if stats is not None:
+        stats.total_latency = stats.time_to_first_token = time.perf_counter() - started
+        stats.chunks = 1
+        stats.characters = len(draft)
+    return draft
+
+
+# Yields text deltas as they arrive. Setting cancel_event (or closing the
+# generator) stops reading and closes the HTTP stream.
+def stream_draft(client: "openai.OpenAI", messages: List[Dict[str, str]], stats: GenerationStats,
+                 cancel_event: Optional[threading.Event] = None,
+                 model: str = MODEL, temperature: float = TEMPERATURE) -> Iterator[str]:
+    started = time.perf_counter()
+    stream = client.chat.completions.create(model=model, messages=messages, temperature=temperature, stream=True)
+    try:
+        for chunk in stream:
+            if cancel_event is not None and cancel_event.is_set():
+                stats.cancelled = True
+                break
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            if stats.time_to_first_token is None:
+                stats.time_to_first_token = time.perf_counter() - started
+            stats.chunks += 1
+            stats.characters += len(delta)
+            yield delta
+    except GeneratorExit:
+        stats.cancelled = True
+        raise
+    finally:
+        stream.close()
+        stats.total_latency = time.perf_counter() - started
+
+
+# --- Map-reduce generation for large specs ---
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+# Packs paragraphs into sections under the budget; a paragraph that is too
+# large on its own is cut on word boundaries
+def split_sections(text: str, token_budget: int = SECTION_TOKEN_BUDGET) -> List[str]:
+    char_budget = token_budget * CHARS_PER_TOKEN
+    sections = []
+    current: List[str] = []
+    current_size = 0
+
+    def flush():
+        nonlocal current, current_size
+        if current:
+            sections.append("\n\n".join(current))
+        current, current_size = [], 0
+
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        while len(paragraph) > char_budget:
+            cut = paragraph.rfind(" ", 0, char_budget)
+            if cut <= 0:
+                cut = char_budget
+            flush()
+            sections.append(paragraph[:cut])
+            paragraph = paragraph[cut:].strip()
+        if current_size + len(paragraph) > char_budget:
+            flush()
+        current.append(paragraph)
+        current_size += len(paragraph) + 2
+    flush()
+    return sections
+
+
+def build_section_messages(doc_type: str, audience: str, section: str, index: int, total: int) -> List[Dict[str, str]]:
+    system_prompt = f"""
+You are a technical writer preparing notes for a {doc_type} aimed at {audience}.
+You will receive part {index} of {total} of a product specification. Extract every fact the final document needs as concise bullet points.
+Keep model names, numbers, units, warnings and step order exactly as written. Do not add facts that are not in the text.
+"""
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"SPECIFICATION PART {index} OF {total}:\n{section}"},
+    ]
+
+
+# Condenses each section concurrently (at most max_concurrency requests in
+# flight), repeats on the notes while they are still over budget (up to
+# MAX_REDUCE_ROUNDS), then drafts
+# the final document from the merged notes. progress(done, total) is called
+# after each section. send(request, tokens) makes each request, so callers can
+# rate-limit and retry them one by one (see acall_with_retries); by default
+# each request is made once.
+async def map_reduce_draft(client: "openai.AsyncOpenAI", doc_type: str, audience: str, product_info: str,
+                           style_guide: Optional[str] = None, stats: Optional[GenerationStats] = None,
+                           exemplars: Optional[List[str]] = None,
+                           progress: Optional[Callable[[int, int], None]] = None,
+                           send: Optional[Callable[[Callable[[], Awaitable[Any]], int], Awaitable[Any]]] = None,
+                           max_concurrency: int = MAX_CONCURRENCY,
+                           model: str = MODEL, temperature: float = TEMPERATURE) -> str:
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def complete(messages: List[Dict[str, str]]) -> str:
+        def request():
+            return client.chat.completions.create(model=model, messages=messages, temperature=temperature)
+
+        if send is None:
+            response = await request()
+        else:
+            tokens = sum(estimate_tokens(m["content"]) for m in messages) + EXPECTED_OUTPUT_TOKENS
+            response = await send(request, tokens)
+        return response.choices[0].message.content
+
+    notes = product_info
+    section_count = 0
+
+    for _ in range(MAX_REDUCE_ROUNDS):
+        if estimate_tokens(notes) <= CONTEXT_TOKEN_BUDGET:
+            break
+        sections = split_sections(notes)
+        section_count += len(sections)
+        done = 0
+
+        async def condense(index: int, section: str) -> str:
+            nonlocal done
+            async with semaphore:
+                partial = await complete(build_section_messages(doc_type, audience, section, index, len(sections)))
+            done += 1
+            if progress is not None:
+                progress(done, len(sections))
+            return partial
+
+        partials = await asyncio.gather(*(condense(i + 1, section) for i, section in enumerate(sections)))
+        notes = "\n\n".join(f"## Part {i + 1}\n{partial}" for i, partial in enumerate(partials))
+
+    draft = await complete(build_messages(doc_type, audience, notes, style_guide, exemplars))
+    if stats is not None:
+        stats.total_latency = time.perf_counter() - started
+        stats.sections = max(section_count, 1)
+        stats.characters = len(draft)
+    return draft
@@ -0,0 +1,223 @@
+# ghostwriter_jobs.py
+
+from typing import Callable, Dict, List, Optional
+import time
+import uuid
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from ghostwriter_generation import (
+    GenerationStats, estimate_tokens, generate_draft, make_async_client, make_client, map_reduce_draft, stream_draft,
+)
+from ghostwriter_metrics import REGISTRY, count_tokens
+from ghostwriter_ratelimit import EXPECTED_OUTPUT_TOKENS, RateLimiter, acall_with_retries, call_with_retries
+
+JOB_WORKERS = 4
+REQUESTS_PER_MINUTE = 60
+
+# Finished jobs kept for polling; older ones are forgotten first
+MAX_FINISHED_JOBS = 200
+
+QUEUED, RUNNING, RETRYING, DONE, FAILED, CANCELLED = "queued", "running", "retrying", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+# One generation request. Workers write its fields; sessions only read them.
+class Job:
+    def __init__(self, mode: str, label: str, prompt_tokens: int):
+        self.id = uuid.uuid4().hex[:12]
+        self.mode = mode  # 'stream', 'blocking' or 'map_reduce'
+        self.label = label
+        self.prompt_tokens = prompt_tokens
+        self.status = QUEUED
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.attempts = 0
+        self.retry_note: Optional[str] = None
+        self.error: Optional[str] = None
+        self.text = ""  # partial draft while streaming, then the result
+        self.progress: Optional[tuple] = None  # (sections done, total) for map-reduce
+        self.stats = GenerationStats()
+        self._cancel = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINISHED
+
+    def _check_cancel(self):
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    # Backoff sleep that a cancel cuts short
+    def _wait(self, seconds: float):
+        if self._cancel.wait(seconds):
+            raise JobCancelled()
+
+    def _on_retry(self, attempt: int, error: Exception, delay: float):
+        self.status = RETRYING
+        self.retry_note = f"{error.__class__.__name__}, retry {attempt} in {delay:.1f}s"
+        REGISTRY.inc("ghostwriter_openai_retries_total", mode=self.mode, error=error.__class__.__name__)
+
+    def as_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "mode": self.mode,
+            "label": self.label,
+            "status": self.status,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "attempts": self.attempts,
+            "retry_note": self.retry_note,
+            "error": self.error,
+            "characters": len(self.text),
+        }
+
+
+# Process-wide generation queue: a bounded worker pool behind the shared
+# requests/tokens-per-minute limiter. Transient OpenAI errors are retried with
+# jittered backoff; callers poll or cancel by job id.
+class JobQueue:
+    def __init__(self, api_key: str, base_url: Optional[str] = None, workers: int = JOB_WORKERS,
+                 requests_per_minute: float = REQUESTS_PER_MINUTE, tokens_per_minute: Optional[float] = None,
+                 max_finished: int = MAX_FINISHED_JOBS):
+        # Retries are handled here so they can respect the shared limiter
+        self.client = make_client(api_key, base_url, max_retries=0)
+        self.api_key = api_key
+        self.base_url = base_url
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.max_finished = max_finished
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="generation")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit_draft(self, messages: List[Dict[str, str]], stream: bool = True, label: str = "") -> str:
+        job = Job("stream" if stream else "blocking", label, sum(estimate_tokens(m["content"]) for m in messages))
+
+        def attempt() -> str:
+            job._check_cancel()
+            job.text = ""
+            job.stats = GenerationStats()
+            if not stream:
+                job.text = generate_draft(self.client, messages, job.stats)
+                return job.text
+            for delta in stream_draft(self.client, messages, job.stats, job._cancel):
+                job.text += delta
+            return job.text
+
+        return self._submit(job, attempt)
+
+    # Large specs: condense sections concurrently, then draft. Each section and
+    # the final request wait on the limiter and are retried on their own, so a
+    # 429 doesn't redo the sections already condensed; Stop takes effect before
+    # the next request or during a backoff.
+    def submit_map_reduce(self, doc_type: str, audience: str, product_info: str, style_guide: Optional[str] = None,
+                          exemplars: Optional[List[str]] = None, label: str = "") -> str:
+        job = Job("map_reduce", label, estimate_tokens(product_info))
+
+        def progress(done: int, total: int):
+            job.progress = (done, total)
+
+        async def send(request, tokens: int):
+            job._check_cancel()
+            response = await acall_with_retries(request, self.limiter, tokens, on_retry=job._on_retry, sleep=job._wait)
+            job.status = RUNNING
+            return response
+
+        def attempt() -> str:
+            job._check_cancel()
+            job.stats = GenerationStats()
+            # A new client per job: each asyncio.run() has its own event loop
+            async_client = make_async_client(self.api_key, self.base_url, max_retries=0)
+            job.text = asyncio.run(map_reduce_draft(
+                async_client, doc_type, audience, product_info, style_guide, job.stats,
+                exemplars=exemplars, progress=progress, send=send,
+            ))
+            return job.text
+
+        return self._submit(job, attempt, retry=False)
+
+    # retry=False: the attempt limits and retries its own requests
+    def _submit(self, job: Job, attempt: Callable[[], str], retry: bool = True) -> str:
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._pool.submit(self._run, job, attempt, retry)
+        return job.id
+
+    def _run(self, job: Job, attempt: Callable[[], str], retry: bool = True):
+        if job._cancel.is_set():
+            job.status = CANCELLED
+            job.finished = time.time()
+            return
+
+        def counted_attempt() -> str:
+            job.attempts += 1
+            job.status = RUNNING
+            return attempt()
+
+        job.started = time.time()
+        try:
+            if retry:
+                call_with_retries(
+                    counted_attempt,
+                    limiter=self.limiter,
+                    tokens=job.prompt_tokens + EXPECTED_OUTPUT_TOKENS,
+                    on_retry=job._on_retry,
+                    sleep=job._wait,
+                )
+            else:
+                counted_attempt()
+            # A cancelled stream ends early with its partial text kept
+            job.status = CANCELLED if job.stats.cancelled else DONE
+        except JobCancelled:
+            job.status = CANCELLED
+        except Exception as e:
+            job.error = f"{e.__class__.__name__}: {e}"
+            job.status = FAILED
+            REGISTRY.inc("ghostwriter_openai_errors_total", mode=job.mode)
+        finally:
+            job.finished = time.time()
+            self._record(job)
+
+    def _record(self, job: Job):
+        REGISTRY.inc("ghostwriter_generations_total", mode=job.mode, status=job.status)
+        REGISTRY.observe("ghostwriter_job_wait_seconds", (job.started or job.finished) - job.created, mode=job.mode)
+        if job.stats.total_latency is not None:
+            REGISTRY.observe("ghostwriter_openai_request_seconds", job.stats.total_latency, mode=job.mode)
+            if job.stats.time_to_first_token is not None:
+                REGISTRY.observe("ghostwriter_openai_first_token_seconds", job.stats.time_to_first_token, mode=job.mode)
+            count_tokens("prompt", job.prompt_tokens, mode=job.mode)
+            count_tokens("completion", estimate_tokens(job.text), mode=job.mode)
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    # Queued jobs never start; running ones stop at the next chunk or backoff
+    def cancel(self, job_id: str) -> bool:
+        job = self.get(job_id)
+        if job is None or job.done:
+            return False
+        job._cancel.set()
+        return True
+
+    def jobs(self) -> List[Job]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if not job.done)
@@ -0,0 +1,456 @@
+# ghostwriter_library.py
+
+from typing import List, Dict, Iterator, Optional
+import os
+import re
+import json
+import time
+import uuid
+import zlib
+import hashlib
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+from ghostwriter_delta import apply_delta, decode_delta, encode_delta, make_delta
+from ghostwriter_minhash import DUPLICATE_THRESHOLD, band_hashes, pack_signature, signature, similarity, unpack_signature
+
+DOCS_DIR = "docs"
+STORE_NAME = "library.db"
+
+# Files this small can't hold a saved draft (matches the old library filter)
+MIN_DOC_SIZE = 100
+
+# `documents` holds the latest version of each logical document, compressed.
+# `versions` holds reverse deltas: each rebuilds a version from the one after
+# it. `lsh_buckets` maps MinHash bands to documents for near-duplicate lookup.
+# JSON files found in docs/ (the old format) are imported and tracked by
+# json_file/json_mtime.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    audience TEXT NOT NULL,
+    date TEXT NOT NULL,
+    tags TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    content BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    updated REAL NOT NULL,
+    json_file TEXT UNIQUE,
+    json_mtime REAL,
+    minhash BLOB
+);
+CREATE INDEX IF NOT EXISTS documents_by_date ON documents (date DESC, updated DESC);
+CREATE TABLE IF NOT EXISTS lsh_buckets (
+    band INTEGER NOT NULL,
+    hash INTEGER NOT NULL,
+    doc_id TEXT NOT NULL,
+    PRIMARY KEY (band, hash, doc_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS lsh_buckets_by_doc ON lsh_buckets (doc_id);
+CREATE TABLE IF NOT EXISTS versions (
+    doc_id TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    date TEXT NOT NULL,
+    updated REAL NOT NULL,
+    size INTEGER NOT NULL,
+    delta BLOB NOT NULL,
+    PRIMARY KEY (doc_id, version)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+    name, type, audience, tags, content,
+    tokenize = 'porter unicode61'
+);
+"""
+
+SCHEMA_VERSION = 4
+
+# Lowest similarity shown in a document's "similar documents" list
+SIMILAR_THRESHOLD = 0.5
+
+# Ranking weights for name, type, audience, tags, content
+_FTS_WEIGHTS = "10.0, 2.0, 2.0, 5.0, 1.0"
+
+_COLUMNS = ["id", "name", "type", "audience", "date", "tags", "filename", "version"]
+_VERSION_COLUMNS = ["version", "name", "date", "updated", "size"]
+
+
+def connect(docs_dir: str = DOCS_DIR) -> sqlite3.Connection:
+    os.makedirs(docs_dir, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(docs_dir, STORE_NAME), timeout=30)
+    if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+        _migrate(conn)
+    return conn
+
+
+def _schema_statements() -> List[str]:
+    return [statement for statement in _SCHEMA.split(";") if statement.strip()]
+
+
+# Runs under the write lock, re-reading the version once it is held: two
+# first connections must not both drop, create or alter the tables
+def _migrate(conn: sqlite3.Connection):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < 3:
+            # Before version 3 the database only indexed docs/*.json, so it is
+            # dropped and the next sync imports those files into the store
+            for table in ("documents", "documents_fts", "meta"):
+                conn.execute(f"DROP TABLE IF EXISTS {table}")
+            for statement in _schema_statements():
+                conn.execute(statement)
+        elif version == 3:
+            # Version 4 adds MinHash fingerprints; compute them for stored documents
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(documents)")]
+            if "minhash" not in columns:
+                conn.execute("ALTER TABLE documents ADD COLUMN minhash BLOB")
+            for statement in _schema_statements():
+                conn.execute(statement)
+            for doc_id, blob in conn.execute("SELECT id, content FROM documents").fetchall():
+                _set_fingerprint(conn, doc_id, _decompress(blob))
+        if version < SCHEMA_VERSION:
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    if version < 3:
+        # journal_mode can't change inside a transaction
+        conn.execute("PRAGMA journal_mode = WAL")
+
+
+def _compress(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"))
+
+
+def _decompress(blob: bytes) -> str:
+    return zlib.decompress(blob).decode("utf-8")
+
+
+def _set_fingerprint(conn: sqlite3.Connection, doc_id: str, content: str):
+    sig = signature(content)
+    conn.execute("UPDATE documents SET minhash = ? WHERE id = ?", (pack_signature(sig), doc_id))
+    conn.execute("DELETE FROM lsh_buckets WHERE doc_id = ?", (doc_id,))
+    conn.executemany(
+        "INSERT OR IGNORE INTO lsh_buckets (band, hash, doc_id) VALUES (?, ?, ?)",
+        [(band, h, doc_id) for band, h in enumerate(band_hashes(sig))],
+    )
+
+
+def _remove_row(conn: sqlite3.Connection, rowid: int, doc_id: str):
+    conn.execute("DELETE FROM documents_fts WHERE rowid = ?", (rowid,))
+    conn.execute("DELETE FROM documents WHERE rowid = ?", (rowid,))
+    conn.execute("DELETE FROM versions WHERE doc_id = ?", (doc_id,))
+    conn.execute("DELETE FROM lsh_buckets WHERE doc_id = ?", (doc_id,))
+
+
+# Inserts a document, or makes it the latest version of an existing id and
+# keeps a reverse delta to the version it replaces. The full-text entry
+# shares the row's rowid. Returns the current version number.
+def _write_document(conn: sqlite3.Connection, doc: Dict, json_file: Optional[str] = None,
+                    json_mtime: Optional[float] = None) -> int:
+    content = doc.get("content", "")
+    fields = (
+        doc.get("name", json_file or doc["id"]),
+        doc.get("type", ""),
+        doc.get("audience", ""),
+        doc.get("date", ""),
+        json.dumps(doc.get("tags", [])),
+        doc.get("filename", f"{doc['id']}.md"),
+    )
+    existing = conn.execute(
+        "SELECT rowid, version, content, name, date, updated, size FROM documents WHERE id = ?", (doc["id"],)
+    ).fetchone()
+
+    if existing is None:
+        if json_file is not None:
+            # The file now carries a different id, so its old record goes
+            stale = conn.execute("SELECT rowid, id FROM documents WHERE json_file = ?", (json_file,)).fetchone()
+            if stale is not None:
+                _remove_row(conn, *stale)
+        version = 1
+        rowid = conn.execute(
+            "INSERT INTO documents (id, name, type, audience, date, tags, filename, version, content, size, updated, json_file, json_mtime) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (doc["id"], *fields, version, _compress(content), len(content), time.time(), json_file, json_mtime),
+        ).lastrowid
+    else:
+        rowid, version, old_blob, old_name, old_date, old_updated, old_size = existing
+        old_content = _decompress(old_blob)
+        if old_content != content:
+            conn.execute(
+                "INSERT INTO versions (doc_id, version, name, date, updated, size, delta) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (doc["id"], version, old_name, old_date, old_updated, old_size, encode_delta(make_delta(content, old_content))),
+            )
+            version += 1
+        conn.execute(
+            "UPDATE documents SET name = ?, type = ?, audience = ?, date = ?, tags = ?, filename = ?, version = ?, "
+            "content = ?, size = ?, updated = ?, json_file = COALESCE(?, json_file), json_mtime = COALESCE(?, json_mtime) "
+            "WHERE rowid = ?",
+            (*fields, version, _compress(content), len(content), time.time(), json_file, json_mtime, rowid),
+        )
+        conn.execute("DELETE FROM documents_fts WHERE rowid = ?", (rowid,))
+
+    conn.execute(
+        "INSERT INTO documents_fts (rowid, name, type, audience, tags, content) VALUES (?, ?, ?, ?, ?, ?)",
+        (rowid, fields[0], fields[1], fields[2], " ".join(doc.get("tags", [])), content),
+    )
+    _set_fingerprint(conn, doc["id"], content)
+    return version
+
+
+# JSON file name -> mtime for every importable file in docs/. The directory's
+# own mtime can't stand in for this: library.db and its -wal/-shm files live
+# there too and touch it on every connect.
+def _json_files(docs_dir: str) -> Dict[str, float]:
+    on_disk = {}
+    for entry in os.scandir(docs_dir):
+        if entry.name.endswith(".json"):
+            stat = entry.stat()
+            if stat.st_size > MIN_DOC_SIZE:
+                on_disk[entry.name] = stat.st_mtime
+    return on_disk
+
+
+def _json_state(on_disk: Dict[str, float]) -> str:
+    return hashlib.sha1(repr(sorted(on_disk.items())).encode("utf-8")).hexdigest()
+
+
+def _json_unchanged(conn: sqlite3.Connection, on_disk: Dict[str, float]) -> bool:
+    row = conn.execute("SELECT value FROM meta WHERE key = 'json_state'").fetchone()
+    return bool(row) and row[0] == _json_state(on_disk)
+
+
+# Takes the write lock up front: version numbers and imports are
+# read-then-write, so two sessions must not interleave them
+def _begin_write(conn: sqlite3.Connection):
+    conn.execute("BEGIN IMMEDIATE")
+
+
+def _set_json_state(conn: sqlite3.Connection, on_disk: Dict[str, float]):
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_state', ?)", (_json_state(on_disk),))
+
+
+# Imports JSON files dropped into docs/. When no JSON file was added, removed
+# or modified this is a directory scan and one read, without the write lock;
+# otherwise only new or modified files are parsed.
+def sync_index(docs_dir: str = DOCS_DIR) -> List[str]:
+    warnings = []
+    with closing(connect(docs_dir)) as conn, conn:
+        if _json_unchanged(conn, _json_files(docs_dir)):
+            return warnings
+        _begin_write(conn)
+        # Another session may have imported the same files while we waited
+        on_disk = _json_files(docs_dir)
+        if _json_unchanged(conn, on_disk):
+            return warnings
+
+        imported = {
+            json_file: (rowid, doc_id, mtime)
+            for rowid, doc_id, json_file, mtime in conn.execute(
+                "SELECT rowid, id, json_file, json_mtime FROM documents WHERE json_file IS NOT NULL"
+            )
+        }
+
+        for json_file in imported.keys() - on_disk.keys():
+            rowid, doc_id, _ = imported[json_file]
+            _remove_row(conn, rowid, doc_id)
+
+        for json_file, mtime in on_disk.items():
+            if json_file in imported and imported[json_file][2] == mtime:
+                continue
+            try:
+                with open(os.path.join(docs_dir, json_file), "r") as f:
+                    doc = json.load(f)
+                _write_document(conn, doc, json_file, mtime)
+            except Exception as e:
+                warnings.append(f"Skipping '{json_file}': file is invalid or corrupt. ({e})")
+
+        _set_json_state(conn, on_disk)
+    return warnings
+
+
+# Builds a record in the library format
+def new_document(name: str, doc_type: str, audience: str, content: str, tags: Optional[List[str]] = None) -> Dict:
+    doc_id = str(uuid.uuid4())
+    return {
+        "id": doc_id,
+        "name": name,
+        "type": doc_type,
+        "audience": audience,
+        "date": datetime.now().strftime("%Y-%m-%d"),
+        "content": content,
+        "tags": tags or [],
+        "filename": f"{doc_id}.md",
+    }
+
+
+# One transaction: the document either saves completely or not at all.
+# Saving an existing id adds a version; returns the current version number.
+def save_document(doc_data: Dict, docs_dir: str = DOCS_DIR) -> int:
+    with closing(connect(docs_dir)) as conn, conn:
+        _begin_write(conn)
+        return _write_document(conn, doc_data)
+
+
+def delete_document(doc_id: str, docs_dir: str = DOCS_DIR):
+    with closing(connect(docs_dir)) as conn, conn:
+        _begin_write(conn)
+        row = conn.execute("SELECT rowid, json_file FROM documents WHERE id = ?", (doc_id,)).fetchone()
+        if row is None:
+            return
+        rowid, json_file = row
+        _remove_row(conn, rowid, doc_id)
+        if json_file is not None:
+            path = os.path.join(docs_dir, json_file)
+            if os.path.exists(path):
+                os.remove(path)
+            # The next sync rescans rather than miss a file changed meanwhile
+            conn.execute("DELETE FROM meta WHERE key = 'json_state'")
+
+
+def count_documents(docs_dir: str = DOCS_DIR) -> int:
+    with closing(connect(docs_dir)) as conn:
+        return conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+
+def _row_to_doc(row) -> Dict:
+    doc = dict(zip(_COLUMNS, row))
+    doc["tags"] = json.loads(doc["tags"])
+    return doc
+
+
+# Metadata only — the document body is never read here
+def list_documents(limit: int = 20, offset: int = 0, docs_dir: str = DOCS_DIR) -> List[Dict]:
+    with closing(connect(docs_dir)) as conn:
+        rows = conn.execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM documents ORDER BY date DESC, updated DESC LIMIT ? OFFSET ?",
+            (limit, offset),
+        ).fetchall()
+    return [_row_to_doc(row) for row in rows]
+
+
+# Quotes every word so user input can't break FTS5 syntax. No prefix
+# queries: a short prefix can expand to most of the vocabulary.
+def _match_expression(query: str) -> Optional[str]:
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words)
+
+
+# Ranked full-text search over name, type, audience, tags and content
+def search_documents(query: str, limit: int = 20, docs_dir: str = DOCS_DIR) -> List[Dict]:
+    match = _match_expression(query)
+    if match is None:
+        return []
+    columns = ", ".join(f"d.{column}" for column in _COLUMNS)
+    with closing(connect(docs_dir)) as conn:
+        rows = conn.execute(
+            f"SELECT {columns}, snippet(documents_fts, 4, '**', '**', ' … ', 16) "
+            f"FROM documents_fts JOIN documents d ON d.rowid = documents_fts.rowid "
+            f"WHERE documents_fts MATCH ? ORDER BY bm25(documents_fts, {_FTS_WEIGHTS}) LIMIT ?",
+            (match, limit),
+        ).fetchall()
+    results = []
+    for row in rows:
+        doc = _row_to_doc(row[:-1])
+        doc["snippet"] = row[-1]
+        results.append(doc)
+    return results
+
+
+# Latest version: one row and one decompress, however long the history
+def load_document(doc_id: str, docs_dir: str = DOCS_DIR) -> Optional[Dict]:
+    with closing(connect(docs_dir)) as conn:
+        row = conn.execute(f"SELECT {', '.join(_COLUMNS)}, content FROM documents WHERE id = ?", (doc_id,)).fetchone()
+    if row is None:
+        return None
+    doc = _row_to_doc(row[:-1])
+    doc["content"] = _decompress(row[-1])
+    return doc
+
+
+# Every document with its content, streamed in batches so memory stays
+# bounded however large the library is
+def iter_documents(docs_dir: str = DOCS_DIR, batch_size: int = 200) -> Iterator[Dict]:
+    with closing(connect(docs_dir)) as conn:
+        cursor = conn.execute(f"SELECT {', '.join(_COLUMNS)}, content FROM documents ORDER BY rowid")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                doc = _row_to_doc(row[:-1])
+                doc["content"] = _decompress(row[-1])
+                yield doc
+
+
+# Only documents sharing an LSH band with the signature are compared
+def _similar(conn: sqlite3.Connection, sig, threshold: float, limit: int, exclude_id: Optional[str]) -> List[Dict]:
+    bands = band_hashes(sig)
+    placeholders = " OR ".join("(b.band = ? AND b.hash = ?)" for _ in bands)
+    rows = conn.execute(
+        f"SELECT DISTINCT {', '.join(f'd.{column}' for column in _COLUMNS)}, d.minhash "
+        f"FROM lsh_buckets b JOIN documents d ON d.id = b.doc_id WHERE {placeholders}",
+        [value for band in enumerate(bands) for value in band],
+    ).fetchall()
+    results = []
+    for row in rows:
+        doc = _row_to_doc(row[:-1])
+        if doc["id"] == exclude_id:
+            continue
+        doc["similarity"] = similarity(sig, unpack_signature(row[-1]))
+        if doc["similarity"] >= threshold:
+            results.append(doc)
+    results.sort(key=lambda doc: doc["similarity"], reverse=True)
+    return results[:limit]
+
+
+# Library documents that are near-copies of the text, most similar first
+def find_duplicates(content: str, threshold: float = DUPLICATE_THRESHOLD, limit: int = 5,
+                    docs_dir: str = DOCS_DIR) -> List[Dict]:
+    with closing(connect(docs_dir)) as conn:
+        return _similar(conn, signature(content), threshold, limit, None)
+
+
+def similar_documents(doc_id: str, threshold: float = SIMILAR_THRESHOLD, limit: int = 5,
+                      docs_dir: str = DOCS_DIR) -> List[Dict]:
+    with closing(connect(docs_dir)) as conn:
+        row = conn.execute("SELECT minhash FROM documents WHERE id = ?", (doc_id,)).fetchone()
+        if row is None or row[0] is None:
+            return []
+        return _similar(conn, unpack_signature(row[0]), threshold, limit, doc_id)
+
+
+# Earlier versions, newest first
+def list_versions(doc_id: str, docs_dir: str = DOCS_DIR) -> List[Dict]:
+    with closing(connect(docs_dir)) as conn:
+        rows = conn.execute(
+            f"SELECT {', '.join(_VERSION_COLUMNS)} FROM versions WHERE doc_id = ? ORDER BY version DESC", (doc_id,)
+        ).fetchall()
+    return [dict(zip(_VERSION_COLUMNS, row)) for row in rows]
+
+
+# Walks the reverse deltas back from the latest version
+def load_version(doc_id: str, version: int, docs_dir: str = DOCS_DIR) -> Optional[str]:
+    with closing(connect(docs_dir)) as conn:
+        row = conn.execute("SELECT version, content FROM documents WHERE id = ?", (doc_id,)).fetchone()
+        if row is None or not 1 <= version <= row[0]:
+            return None
+        deltas = conn.execute(
+            "SELECT delta FROM versions WHERE doc_id = ? AND version >= ? ORDER BY version DESC", (doc_id, version)
+        ).fetchall()
+    content = _decompress(row[1])
+    for (delta,) in deltas:
+        content = apply_delta(content, decode_delta(delta))
+    return content
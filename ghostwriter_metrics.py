@@ -0,0 +1,171 @@
+# ghostwriter_metrics.py
+
+from typing import Dict, Iterator, List, Optional, Tuple
+import json
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+from ghostwriter_storage import atomic_write
+
+# Upper bounds in seconds; fixed buckets keep an observation O(log buckets)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536)
+
+# How often the background exporter rewrites the metrics file
+EXPORT_SECONDS = 15
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    # Upper bound of the bucket holding the q-th observation. Past the last
+    # bucket this is the largest finite bound, as Prometheus's
+    # histogram_quantile does, so the JSON export stays valid JSON.
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+
+# Process-wide store of counters and histograms. Recording takes one lock and
+# a bisect, cheap enough to leave on around every hot path.
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self.started = time.time()
+
+    def inc(self, name: str, value: float = 1, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = LATENCY_BUCKETS, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.started = time.time()
+
+    def as_dict(self) -> Dict:
+        with self._lock:
+            return {
+                "started": self.started,
+                "counters": [
+                    {"name": name, "labels": dict(key), "value": value}
+                    for name, series in sorted(self.counters.items()) for key, value in series.items()
+                ],
+                "histograms": [
+                    {
+                        "name": name,
+                        "labels": dict(key),
+                        "count": h.count,
+                        "sum": h.sum,
+                        "p50": h.quantile(0.5),
+                        "p95": h.quantile(0.95),
+                        "p99": h.quantile(0.99),
+                        "buckets": dict(zip([str(b) for b in h.buckets] + ["+Inf"], h.counts)),
+                    }
+                    for name, series in sorted(self.histograms.items()) for key, h in series.items()
+                ],
+            }
+
+    # Prometheus text exposition format (cumulative buckets)
+    def as_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+            for name, series in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for key, h in series.items():
+                    cumulative = 0
+                    for bound, count in zip([str(b) for b in h.buckets] + ["+Inf"], h.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(key + (('le', bound),))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {h.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(key: Labels) -> str:
+    if not key:
+        return ""
+    pairs = []
+    for k, v in key:
+        value = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{k}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+REGISTRY = Registry()
+
+
+# Times the block into the `<name>_seconds` histogram, even when it raises
+@contextmanager
+def span(name: str, **labels: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRY.observe(f"ghostwriter_{name}_seconds", time.perf_counter() - started, **labels)
+
+
+def count_tokens(kind: str, tokens: int, **labels: str):
+    REGISTRY.inc(f"ghostwriter_{kind}_tokens_total", tokens, **labels)
+    REGISTRY.observe(f"ghostwriter_{kind}_tokens", tokens, TOKEN_BUCKETS, **labels)
+
+
+# .prom files get Prometheus text, anything else JSON; written via rename so
+# a scraper never reads half a file
+def export_metrics(path: str, registry: Registry = REGISTRY):
+    if path.endswith(".prom"):
+        payload = registry.as_prometheus()
+    else:
+        payload = json.dumps(registry.as_dict(), indent=2)
+    atomic_write(path, payload)
+
+
+def start_exporter(path: str, interval: float = EXPORT_SECONDS) -> threading.Thread:
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                export_metrics(path)
+            except OSError:
+                pass
+
+    thread = threading.Thread(target=run, name="metrics-export", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,108 @@
+# ghostwriter_minhash.py
+
+from typing import Dict, Hashable, List, Set, Tuple
+import re
+import zlib
+from array import array
+from hashlib import blake2b
+
+WORD_RE = re.compile(r"\w+")
+
+# Word n-grams compared between documents
+SHINGLE_WORDS = 5
+
+# Signature length, split into BANDS bands of NUM_PERM // BANDS values for LSH.
+# 16 bands of 8 make documents above ~0.7 similarity collide in some band.
+NUM_PERM = 128
+BANDS = 16
+
+# Estimated Jaccard similarity above which two documents count as duplicates
+DUPLICATE_THRESHOLD = 0.8
+
+_BIN_BITS = NUM_PERM.bit_length() - 1
+_EMPTY = (1 << 64) - 1
+
+Signature = Tuple[int, ...]
+
+
+def shingles(text: str) -> Set[str]:
+    words = WORD_RE.findall(text.lower())
+    if len(words) <= SHINGLE_WORDS:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+# One-permutation MinHash: each shingle is hashed once into one of NUM_PERM
+# bins and each bin keeps its minimum, so the cost is O(shingles) rather than
+# O(shingles × NUM_PERM). Empty bins borrow from the next filled bin.
+def signature(text: str) -> Signature:
+    bins = [_EMPTY] * NUM_PERM
+    for shingle in shingles(text):
+        h = int.from_bytes(blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+        i = h & (NUM_PERM - 1)
+        value = h >> _BIN_BITS
+        if value < bins[i]:
+            bins[i] = value
+    if all(value == _EMPTY for value in bins):
+        return tuple(bins)
+    filled = bins[:]
+    for i in range(NUM_PERM):
+        distance = 0
+        while filled[(i + distance) % NUM_PERM] == _EMPTY:
+            distance += 1
+        if distance:
+            bins[i] = filled[(i + distance) % NUM_PERM] + (distance << (64 - _BIN_BITS))
+    return tuple(bins)
+
+
+def similarity(a: Signature, b: Signature) -> float:
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def band_hashes(sig: Signature) -> List[int]:
+    rows = NUM_PERM // BANDS
+    return [zlib.crc32(array("Q", sig[i * rows:(i + 1) * rows]).tobytes()) for i in range(BANDS)]
+
+
+def pack_signature(sig: Signature) -> bytes:
+    return array("Q", sig).tobytes()
+
+
+def unpack_signature(blob: bytes) -> Signature:
+    return tuple(array("Q", blob))
+
+
+# In-memory LSH: a lookup only compares against keys that share a band bucket,
+# so it stays sub-linear in the number of documents indexed
+class LSHIndex:
+    def __init__(self):
+        self.signatures: Dict[Hashable, Signature] = {}
+        self._buckets: Dict[Tuple[int, int], Set[Hashable]] = {}
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def add(self, key: Hashable, sig: Signature):
+        if key in self.signatures:
+            self.remove(key)
+        self.signatures[key] = sig
+        for band, h in enumerate(band_hashes(sig)):
+            self._buckets.setdefault((band, h), set()).add(key)
+
+    def remove(self, key: Hashable):
+        sig = self.signatures.pop(key, None)
+        if sig is None:
+            return
+        for band, h in enumerate(band_hashes(sig)):
+            bucket = self._buckets[(band, h)]
+            bucket.discard(key)
+            if not bucket:
+                del self._buckets[(band, h)]
+
+    # Keys at or above the threshold, most similar first
+    def query(self, sig: Signature, threshold: float = DUPLICATE_THRESHOLD) -> List[Tuple[Hashable, float]]:
+        candidates = set()
+        for band, h in enumerate(band_hashes(sig)):
+            candidates |= self._buckets.get((band, h), set())
+        scored = [(key, similarity(sig, self.signatures[key])) for key in candidates]
+        return sorted((item for item in scored if item[1] >= threshold), key=lambda item: item[1], reverse=True)
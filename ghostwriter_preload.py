@@ -0,0 +1,29 @@
+# ghostwriter_preload.py
+
+from typing import Sequence
+import time
+import importlib
+import threading
+
+from ghostwriter_metrics import REGISTRY
+
+# Imported on first use everywhere: the OpenAI client, Markdown → HTML, and
+# the PDF and Word extractors. Together they add most of a second to startup.
+HEAVY_MODULES = ("openai", "markdown2", "fitz", "docx")
+
+
+# Imports the modules on a daemon thread so the first request that needs one
+# doesn't wait for it. Import times land in ghostwriter_import_seconds.
+def preload(modules: Sequence[str] = HEAVY_MODULES) -> threading.Thread:
+    def run():
+        for name in modules:
+            started = time.perf_counter()
+            try:
+                importlib.import_module(name)
+            except ImportError:
+                continue
+            REGISTRY.observe("ghostwriter_import_seconds", time.perf_counter() - started, module=name)
+
+    thread = threading.Thread(target=run, name="preload", daemon=True)
+    thread.start()
+    return thread
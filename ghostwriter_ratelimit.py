@@ -0,0 +1,149 @@
+# ghostwriter_ratelimit.py
+
+from typing import Awaitable, Callable, Optional, Tuple, TypeVar
+import time
+import random
+import asyncio
+import threading
+from functools import lru_cache
+
+T = TypeVar("T")
+
+
+# Errors worth another attempt; anything else is returned to the caller at once.
+# Resolved on first use so that importing this module doesn't load openai.
+@lru_cache(maxsize=None)
+def retryable_errors() -> Tuple[type, ...]:
+    import openai
+    return (
+        openai.RateLimitError,
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.InternalServerError,
+    )
+
+MAX_ATTEMPTS = 5
+BASE_DELAY = 1.0
+MAX_DELAY = 60.0
+
+# Expected completion size, counted against the tokens-per-minute budget
+EXPECTED_OUTPUT_TOKENS = 1500
+
+
+# Classic token bucket refilled continuously at rate_per_minute
+class TokenBucket:
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        if rate_per_minute <= 0:
+            raise ValueError(f"Rate must be positive, got {rate_per_minute}")
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    # Returns how long the caller must wait before `amount` is available (0 when taken)
+    def _try_take(self, amount: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_second)
+            self._updated = now
+            if self._tokens >= amount:
+                self._tokens -= amount
+                return 0.0
+            return (amount - self._tokens) / self.rate_per_second
+
+    def acquire(self, amount: float = 1):
+        amount = min(amount, self.capacity)
+        while True:
+            wait = self._try_take(amount)
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+# Requests-per-minute and tokens-per-minute limits shared by every worker.
+# A 429 pauses all callers, not just the one that hit it.
+class RateLimiter:
+    def __init__(self, requests_per_minute: float, tokens_per_minute: Optional[float] = None):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def acquire(self, tokens: int = 0):
+        while True:
+            with self._lock:
+                wait = self._paused_until - time.monotonic()
+            if wait <= 0:
+                break
+            time.sleep(wait)
+        self.requests.acquire(1)
+        if self.tokens is not None and tokens:
+            self.tokens.acquire(tokens)
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+# Exponential backoff with full jitter; honors Retry-After when the server sends it
+def backoff_delay(attempt: int, error: Optional[Exception] = None,
+                  base_delay: float = BASE_DELAY, max_delay: float = MAX_DELAY) -> float:
+    retry_after = _retry_after(error) if error is not None else None
+    if retry_after is not None:
+        return min(retry_after, max_delay)
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+# How long to back off after a retryable error; a 429 pauses the whole limiter
+def _retry_delay(attempt: int, error: Exception, limiter: Optional[RateLimiter], base_delay: float, max_delay: float,
+                 on_retry: Optional[Callable[[int, Exception, float], None]]) -> float:
+    import openai  # already loaded: it raised error
+    delay = backoff_delay(attempt, error, base_delay, max_delay)
+    if limiter is not None and isinstance(error, openai.RateLimitError):
+        limiter.pause(delay)
+    if on_retry is not None:
+        on_retry(attempt + 1, error, delay)
+    return delay
+
+
+def call_with_retries(fn: Callable[[], T], limiter: Optional[RateLimiter] = None, tokens: int = 0,
+                      max_attempts: int = MAX_ATTEMPTS, base_delay: float = BASE_DELAY, max_delay: float = MAX_DELAY,
+                      on_retry: Optional[Callable[[int, Exception, float], None]] = None,
+                      sleep: Callable[[float], None] = time.sleep) -> T:
+    for attempt in range(max_attempts):
+        if limiter is not None:
+            limiter.acquire(tokens)
+        try:
+            return fn()
+        except retryable_errors() as e:
+            if attempt == max_attempts - 1:
+                raise
+            sleep(_retry_delay(attempt, e, limiter, base_delay, max_delay, on_retry))
+
+
+# call_with_retries for coroutines. The limiter and sleep block, so they run
+# in a thread and the other requests on the loop carry on meanwhile.
+async def acall_with_retries(fn: Callable[[], Awaitable[T]], limiter: Optional[RateLimiter] = None, tokens: int = 0,
+                             max_attempts: int = MAX_ATTEMPTS, base_delay: float = BASE_DELAY, max_delay: float = MAX_DELAY,
+                             on_retry: Optional[Callable[[int, Exception, float], None]] = None,
+                             sleep: Callable[[float], None] = time.sleep) -> T:
+    for attempt in range(max_attempts):
+        if limiter is not None:
+            await asyncio.to_thread(limiter.acquire, tokens)
+        try:
+            return await fn()
+        except retryable_errors() as e:
+            if attempt == max_attempts - 1:
+                raise
+            await asyncio.to_thread(sleep, _retry_delay(attempt, e, limiter, base_delay, max_delay, on_retry))
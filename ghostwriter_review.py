@@ -0,0 +1,161 @@
+# ghostwriter_review.py
+
+from typing import Dict, FrozenSet, Iterator, List, Mapping, NamedTuple, Tuple
+import re
+
+from ghostwriter_terms import TermMatch, TermMatcher
+
+CATEGORIES = ("tone", "structure", "terminology")
+
+# One tokenizer pass drives every check: words, sentence punctuation and newlines
+TOKEN_RE = re.compile(r"\w+|[.!?]|\n")
+PASSIVE_AUXILIARIES = frozenset({"is", "was", "were", "be", "been", "being"})
+
+# Sentences longer than this multiple of the learned average are flagged
+LONG_SENTENCE_FACTOR = 1.5
+
+
+class Finding(NamedTuple):
+    category: str  # 'tone', 'structure' or 'terminology'
+    message: str
+    key: str       # findings with the same key are merged
+    line: int      # 1-based line of the finding
+    offset: int    # character offset into the reviewed text
+
+
+# Scans the text once and yields findings as soon as they are known
+def iter_findings(
+    text: str,
+    avg_sentence_length: float,
+    term_matcher: TermMatcher,
+    term_frequencies: Mapping[str, int],
+) -> Iterator[Finding]:
+    long_sentence = avg_sentence_length * LONG_SENTENCE_FACTOR
+    text_length = len(text)
+
+    terms = term_matcher.stream()
+
+    line = 1
+    sentence_start = None
+    sentence_line = 1
+    sentence_words = 0
+    passive = False
+    prev_word = ""
+    prev_end = 0
+
+    for match in TOKEN_RE.finditer(text):
+        token = match.group()
+        start, end = match.span()
+
+        if token == "\n":
+            line += 1
+            continue
+
+        if token in ".!?":
+            # Same boundary rule as before: punctuation followed by whitespace or the end
+            if end < text_length and not text[end].isspace():
+                continue
+            for term in terms.flush():
+                yield _term_finding(text, term)
+            if sentence_start is not None:
+                yield from _sentence_findings(text, sentence_start, end, sentence_line, sentence_words, passive, long_sentence)
+            sentence_start = None
+            sentence_words = 0
+            passive = False
+            prev_word = ""
+            continue
+
+        word = token.lower()
+        if sentence_start is None:
+            sentence_start = start
+            sentence_line = line
+        sentence_words += 1
+
+        if (
+            not passive
+            and prev_word in PASSIVE_AUXILIARIES
+            and len(word) > 2
+            and word.endswith("ed")
+            and text[prev_end:start].isspace()
+        ):
+            passive = True
+        prev_word = word
+        prev_end = end
+
+        for term in terms.feed(word, start, end, line):
+            yield _term_finding(text, term)
+        if term_frequencies.get(word, 0) == 1 and word not in term_matcher:
+            yield Finding("terminology", f"Infrequent term: '{token}'", f"infrequent:{word}", line, start)
+
+    for term in terms.flush():
+        yield _term_finding(text, term)
+    if sentence_start is not None:
+        yield from _sentence_findings(text, sentence_start, text_length, sentence_line, sentence_words, passive, long_sentence)
+
+
+def _term_finding(text: str, term: TermMatch) -> Finding:
+    return Finding("terminology", f"Use '{term.preferred}' instead of '{text[term.start:term.end]}'", f"preferred:{term.variant}", term.line, term.start)
+
+
+def _sentence_findings(text, start, end, line, words, passive, long_sentence) -> Iterator[Finding]:
+    if words <= long_sentence and not passive:
+        return
+    sentence = text[start:end].strip()
+    if words > long_sentence:
+        yield Finding("structure", f"Long sentence: {sentence}", f"long:{sentence}", line, start)
+    if passive:
+        yield Finding("tone", f"Passive voice: {sentence}", f"passive:{sentence}", line, start)
+
+
+# Merges repeated findings, keeping the first occurrence and a count
+class ReviewSummary:
+    def __init__(self):
+        self.entries: Dict[str, Dict[str, List]] = {category: {} for category in CATEGORIES}
+
+    # Returns True the first time a finding's key is seen
+    def add(self, finding: Finding) -> bool:
+        entries = self.entries[finding.category]
+        entry = entries.get(finding.key)
+        if entry is None:
+            entries[finding.key] = [finding, 1]
+            return True
+        entry[1] += 1
+        return False
+
+    def lines(self, category: str) -> List[str]:
+        result = []
+        for finding, count in self.entries[category].values():
+            suffix = f" (×{count})" if count > 1 else ""
+            result.append(f"Line {finding.line}: {finding.message}{suffix}")
+        return result
+
+    def as_feedback(self) -> Dict[str, List[str]]:
+        return {category: self.lines(category) for category in CATEGORIES}
+
+
+# What the reviewer reads from a workspace, frozen so it can be shipped to
+# worker processes. The infrequent-term check only asks whether a word was
+# seen exactly once, so those words are kept instead of the full counts.
+class StyleSnapshot(NamedTuple):
+    avg_sentence_length: float
+    rare_terms: FrozenSet[str]
+    preferred_terms: Tuple[Tuple[str, str], ...]  # (normalized variant, preferred)
+
+
+# Reviews against a StyleSnapshot; the term trie is rebuilt once per reviewer
+class SnapshotReviewer:
+    def __init__(self, snapshot: StyleSnapshot):
+        self.snapshot = snapshot
+        self.term_matcher = TermMatcher()
+        for variant, preferred in snapshot.preferred_terms:
+            self.term_matcher.add(variant, preferred)
+        self._term_frequencies = dict.fromkeys(snapshot.rare_terms, 1)
+
+    def iter_review(self, text: str) -> Iterator[Finding]:
+        return iter_findings(text, self.snapshot.avg_sentence_length, self.term_matcher, self._term_frequencies)
+
+    def review(self, text: str) -> ReviewSummary:
+        summary = ReviewSummary()
+        for finding in self.iter_review(text):
+            summary.add(finding)
+        return summary
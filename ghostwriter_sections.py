@@ -0,0 +1,117 @@
+# ghostwriter_sections.py
+
+from typing import Dict, List, NamedTuple, Optional, Sequence
+import re
+
+from ghostwriter_generation import build_system_prompt, build_user_input
+
+HEADING_RE = re.compile(r"(#{1,6})[ \t]+(.*?)[ \t#]*")
+FENCE_RE = re.compile(r"\s*(```|~~~)")
+MARKER_RE = re.compile(r"^<!-- section (\d+) -->[ \t]*\n?", re.M)
+
+# Sections that aren't being rewritten are sent as their heading plus this
+# many words, enough for the model to keep the rest of the draft consistent
+CONTEXT_WORDS = 40
+
+SECTION_INSTRUCTIONS = """
+You are revising part of an existing draft. Rewrite only the sections you are asked to, keeping their Markdown heading levels.
+Reply with each rewritten section on its own, starting with its marker line exactly as given (for example "<!-- section 2 -->"), then the section including its heading.
+Do not repeat, summarize or comment on any other part of the document.
+"""
+
+
+class Section(NamedTuple):
+    level: int  # heading level; 0 for text before the first heading
+    title: str
+    text: str   # from the heading line up to the next heading that splits
+
+    @property
+    def label(self) -> str:
+        return f"{'#' * self.level} {self.title}" if self.level else "(text before the first heading)"
+
+
+# Splits on headings up to max_level outside fenced code; deeper headings stay
+# inside their section. Joining the texts gives back the original Markdown exactly.
+def parse_sections(markdown: str, max_level: int = 2) -> List[Section]:
+    sections = []
+    level, title, lines = 0, "", []
+    in_fence = False
+    for line in markdown.splitlines(keepends=True):
+        if FENCE_RE.match(line):
+            in_fence = not in_fence
+            match = None
+        else:
+            match = None if in_fence else HEADING_RE.fullmatch(line.rstrip("\r\n"))
+        if match and len(match.group(1)) <= max_level:
+            if lines:
+                sections.append(Section(level, title, "".join(lines)))
+            level, title, lines = len(match.group(1)), match.group(2), [line]
+        else:
+            lines.append(line)
+    if lines:
+        sections.append(Section(level, title, "".join(lines)))
+    return sections
+
+
+def _excerpt(section: Section) -> str:
+    body = section.text.partition("\n")[2] if section.level else section.text
+    words = body.split()
+    excerpt = " ".join(words[:CONTEXT_WORDS])
+    return excerpt + (" …" if len(words) > CONTEXT_WORDS else "")
+
+
+# The draft with the chosen sections in full and the rest cut to an excerpt
+def compact_draft(sections: Sequence[Section], indices: Sequence[int]) -> str:
+    parts = []
+    for i, section in enumerate(sections):
+        if i in indices:
+            parts.append(f"<!-- section {i} -->\n{section.text.strip()}")
+        elif section.text.strip():
+            heading = section.label + "\n" if section.level else ""
+            parts.append(f"{heading}{_excerpt(section)}")
+    return "\n\n".join(parts)
+
+
+def build_section_messages(doc_type: str, audience: str, product_info: str, sections: Sequence[Section],
+                           indices: Sequence[int], instructions: str = "", style_guide: Optional[str] = None,
+                           exemplars: Optional[List[str]] = None) -> List[Dict[str, str]]:
+    numbers = ", ".join(str(i) for i in indices)
+    change = instructions.strip() or "Bring these sections in line with the product info."
+    user = (
+        f"{build_user_input(doc_type, audience, product_info)}\n"
+        f"CURRENT DRAFT (sections to rewrite are marked and in full; the rest is abridged):\n"
+        f"{compact_draft(sections, indices)}\n\n"
+        f"CHANGE REQUESTED: {change}\n"
+        f"Rewrite only section(s) {numbers}."
+    )
+    return [
+        {"role": "system", "content": build_system_prompt(doc_type, audience, style_guide, exemplars) + SECTION_INSTRUCTIONS},
+        {"role": "user", "content": user},
+    ]
+
+
+# Rewritten text by section index. A reply for a single section may omit its marker.
+def parse_rewrites(response: str, indices: Sequence[int]) -> Dict[int, str]:
+    parts = MARKER_RE.split(response)
+    if len(parts) == 1:
+        if len(indices) == 1 and response.strip():
+            return {indices[0]: response}
+        raise ValueError("The response does not say which section is which")
+    rewrites = {int(number): text for number, text in zip(parts[1::2], parts[2::2]) if int(number) in indices}
+    missing = [i for i in indices if not rewrites.get(i, "").strip()]
+    if missing:
+        raise ValueError(f"The response is missing section(s) {', '.join(str(i) for i in missing)}")
+    return rewrites
+
+
+# Replaces the rewritten sections, keeping each one's trailing blank lines
+# so the surrounding layout and every untouched section stay byte-for-byte
+def splice_sections(sections: Sequence[Section], rewrites: Dict[int, str]) -> str:
+    parts = []
+    for i, section in enumerate(sections):
+        if i in rewrites:
+            trailing = section.text[len(section.text.rstrip()):]
+            parts.append(rewrites[i].strip() + (trailing or ("\n\n" if i < len(sections) - 1 else "")))
+        else:
+            parts.append(section.text)
+    return "".join(parts)
@@ -0,0 +1,94 @@
+# ghostwriter_storage.py
+
+from typing import IO, Iterator, Optional, Tuple, Union
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+
+# Writes to a uniquely named temp file in the same directory, then renames it
+# over the target: readers see the old file or the new one, never a partial
+# write, and concurrent writers can't clobber each other's temp files
+@contextmanager
+def atomic_open(path: str, mode: str = "wb") -> Iterator[IO]:
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, mode, **({} if "b" in mode else {"encoding": "utf-8"})) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def atomic_write(path: str, data: Union[str, bytes]):
+    with atomic_open(path) as f:
+        f.write(data.encode("utf-8") if isinstance(data, str) else data)
+
+
+# A text file read once per process and again only when its mtime changes,
+# so checking it on every rerun costs a stat rather than a read
+class CachedFile:
+    def __init__(self, path: str):
+        self.path = path
+        self._cached: Optional[Tuple[str, float]] = None
+        self._lock = threading.Lock()
+
+    # (text, mtime), or None when the file doesn't exist
+    def read(self) -> Optional[Tuple[str, float]]:
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            if self._cached is None or self._cached[1] != mtime:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._cached = f.read(), os.fstat(f.fileno()).st_mtime
+            return self._cached
+
+
+# Many readers or one writer. A waiting writer blocks new readers, so a
+# steady stream of reviews can't starve an upload. Not reentrant.
+class RWLock:
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
@@ -0,0 +1,145 @@
+# ghostwriter_style.py
+
+from typing import List, NamedTuple
+import re
+from functools import lru_cache
+
+from ghostwriter_bm25 import BM25Index
+from ghostwriter_generation import estimate_tokens
+
+# Token budget for the style guide in each generation prompt. Guides that fit
+# are sent whole; the bundled style_guide.txt is about 360 tokens.
+STYLE_TOKEN_BUDGET = 1500
+
+# Rules under a heading containing one of these words are always sent
+PINNED_SECTION_WORDS = ("mandatory", "required")
+
+# General rules (formatting, tone, language) apply to every document but never
+# match a spec by keyword, so they're sent next, before the keyword matches
+GENERAL_SECTION_WORDS = ("general", "format", "tone", "style", "voice", "language", "grammar", "writing")
+
+_TABLE_RULE_RE = re.compile(r"^[-|:\s]+$")
+_BULLET_RE = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+")
+# The guide's own title and sign-off, e.g. 'Acme Style Guide' or '✅ End of Style Guide'
+_FRAME_RE = re.compile(r"style guide|^\W*end of\b", re.IGNORECASE)
+
+
+class StyleRule(NamedTuple):
+    section: str
+    text: str
+    pinned: bool
+    general: bool
+
+
+class StyleSelection(NamedTuple):
+    text: str
+    rules_selected: int
+    rules_total: int
+    tokens_selected: int
+    tokens_total: int
+
+
+def _is_heading(line: str, next_line: str) -> bool:
+    if line.startswith("#"):
+        return True
+    # A short line that isn't a bullet, followed by a bullet or table, reads as a heading
+    return (
+        len(line) <= 60
+        and not _BULLET_RE.match(line)
+        and "|" not in line
+        and (bool(_BULLET_RE.match(next_line)) or "|" in next_line)
+    )
+
+
+# One rule per bullet, table row or sentence-style line, tagged with its heading
+def split_rules(style_guide: str) -> List[StyleRule]:
+    lines = [line.rstrip() for line in style_guide.splitlines()]
+    rules = []
+    heading = ""
+    section = ""
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        if not stripped or _TABLE_RULE_RE.match(stripped):
+            continue
+        next_line = next((l.strip() for l in lines[i + 1:] if l.strip()), "")
+        if _is_heading(stripped, next_line):
+            heading = section = stripped.lstrip("#").strip()
+            continue
+        if not _BULLET_RE.match(stripped) and len(stripped) <= 80 and not stripped.endswith(".") and _FRAME_RE.search(stripped):
+            continue
+        if "|" in stripped and _TABLE_RULE_RE.match(next_line):
+            # Table header: keep it with the section so selected rows stay readable
+            section = f"{heading}\n{stripped}"
+            continue
+        if rules and not _BULLET_RE.match(line) and line.startswith((" ", "\t")):
+            # Indented continuation of the previous rule
+            previous = rules[-1]
+            rules[-1] = previous._replace(text=f"{previous.text}\n{line}")
+            continue
+        pinned = any(word in heading.lower() for word in PINNED_SECTION_WORDS)
+        # Rules before the first heading are general too
+        general = not heading or any(word in heading.lower() for word in GENERAL_SECTION_WORDS)
+        rules.append(StyleRule(section, stripped, pinned, general))
+    return rules
+
+
+class StyleGuideIndex:
+    def __init__(self, style_guide: str):
+        self.style_guide = style_guide
+        self.rules = split_rules(style_guide)
+        self.index = BM25Index()
+        for i, rule in enumerate(self.rules):
+            self.index.add(i, f"{rule.section} {rule.text}")
+        self.rule_tokens = [estimate_tokens(rule.text) for rule in self.rules]
+        self.total_tokens = estimate_tokens(style_guide)
+
+    # Pinned rules first, then general ones, then the best BM25 matches for the query, until the
+    # budget is spent. Output keeps the guide's order and headings, and each
+    # heading counts against the budget the first time one of its rules is taken.
+    def select(self, query: str, token_budget: int = STYLE_TOKEN_BUDGET) -> StyleSelection:
+        if self.total_tokens <= token_budget:
+            return StyleSelection(self.style_guide, len(self.rules), len(self.rules), self.total_tokens, self.total_tokens)
+
+        chosen = set()
+        sections = set()
+        spent = 0
+        candidates = [i for i, rule in enumerate(self.rules) if rule.pinned]
+        candidates += [i for i, rule in enumerate(self.rules) if rule.general and not rule.pinned]
+        candidates += [
+            i for i, _ in self.index.search(query, k=len(self.rules))
+            if not self.rules[i].pinned and not self.rules[i].general
+        ]
+        for i in candidates:
+            section = self.rules[i].section
+            cost = self.rule_tokens[i] + (estimate_tokens(section) if section and section not in sections else 0)
+            if spent + cost > token_budget:
+                continue
+            chosen.add(i)
+            sections.add(section)
+            spent += cost
+
+        lines = []
+        section = None
+        for i in sorted(chosen):
+            rule = self.rules[i]
+            if rule.section != section:
+                section = rule.section
+                if section:
+                    lines.append(f"\n{section}")
+            lines.append(rule.text if "|" in rule.text else f"- {_BULLET_RE.sub('', rule.text, count=1)}")
+        text = "\n".join(lines).strip()
+        return StyleSelection(text, len(chosen), len(self.rules), estimate_tokens(text), self.total_tokens)
+
+
+@lru_cache(maxsize=8)
+def style_index(style_guide: str) -> StyleGuideIndex:
+    return StyleGuideIndex(style_guide)
+
+
+def style_query(doc_type: str, audience: str, product_info: str) -> str:
+    return f"{doc_type} {audience} {product_info}"
+
+
+def select_style_rules(style_guide: str, doc_type: str, audience: str, product_info: str,
+                       token_budget: int = STYLE_TOKEN_BUDGET) -> StyleSelection:
+    return style_index(style_guide).select(style_query(doc_type, audience, product_info), token_budget)
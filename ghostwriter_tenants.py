@@ -0,0 +1,164 @@
+# ghostwriter_tenants.py
+
+from typing import Callable, Dict, Optional, Tuple, TypeVar
+import os
+import re
+import sys
+import time
+import zlib
+import atexit
+import pickle
+import threading
+
+from ghostwriter_doc_learning import Workspace
+from ghostwriter_storage import CachedFile, RWLock, atomic_write
+
+TENANTS_DIR = "tenants"
+DEFAULT_TENANT = "default"
+
+# The default tenant keeps the original top-level files so existing
+# deployments carry on with their learned workspace and style guide
+LEGACY_SNAPSHOT = "workspace.snapshot"
+LEGACY_STYLE_GUIDE = "style_guide.txt"
+
+_TENANT_RE = re.compile(r"[^a-z0-9_-]+")
+
+# Snapshots are written this long after the first change in a burst, on a
+# background thread: a write pickles the whole workspace, O(corpus)
+SAVE_DELAY_SECONDS = 2.0
+
+T = TypeVar("T")
+
+
+# What an unreadable snapshot raises: truncated, corrupt, from an unsupported
+# version, or pickled by an incompatible build
+SNAPSHOT_ERRORS = (ValueError, KeyError, EOFError, AttributeError, ImportError, zlib.error, pickle.UnpicklingError)
+
+
+def tenant_name(raw: Optional[str]) -> str:
+    name = _TENANT_RE.sub("-", (raw or "").strip().lower()).strip("-")[:64]
+    return name or DEFAULT_TENANT
+
+
+def snapshot_path(name: str, tenants_dir: str = TENANTS_DIR) -> str:
+    if name == DEFAULT_TENANT:
+        return LEGACY_SNAPSHOT
+    return os.path.join(tenants_dir, name, "workspace.snapshot")
+
+
+# One team's workspace and style guide. Reviews and lookups share the read
+# lock; uploads and term edits take the write lock. Snapshots are pickled
+# under the read lock and written outside it, so readers never wait on disk,
+# and changes are saved together in the background rather than one by one.
+class Tenant:
+    def __init__(self, name: str, tenants_dir: str = TENANTS_DIR):
+        self.name = name
+        self.snapshot_path = snapshot_path(name, tenants_dir)
+        if name == DEFAULT_TENANT:
+            self.style_guide_path = LEGACY_STYLE_GUIDE
+        else:
+            self.style_guide_path = os.path.join(tenants_dir, name, "style_guide.txt")
+        self.lock = RWLock()
+        self.snapshot_error: Optional[str] = None
+        self.workspace = self._load_workspace()
+        self._revision = 0
+        self._saved_revision = 0
+        self._save_lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._timer_lock = threading.Lock()
+        self._style_lock = threading.Lock()
+        self._style_file = CachedFile(self.style_guide_path)
+
+    # An unreadable snapshot is moved aside and the tenant starts empty rather
+    # than failing every request
+    def _load_workspace(self) -> Workspace:
+        try:
+            return Workspace.load_snapshot(self.snapshot_path)
+        except FileNotFoundError:
+            return Workspace()
+        except SNAPSHOT_ERRORS as e:
+            moved_to = f"{self.snapshot_path}.bad-{time.strftime('%Y%m%d-%H%M%S')}"
+            os.replace(self.snapshot_path, moved_to)
+            self.snapshot_error = f"{e.__class__.__name__}: {e}; moved to {moved_to}"
+            print(f"Tenant {self.name}: could not load workspace snapshot ({self.snapshot_error})", file=sys.stderr)
+            return Workspace()
+
+    def read(self, fn: Callable[[Workspace], T]) -> T:
+        with self.lock.read():
+            return fn(self.workspace)
+
+    # Applies a change; the snapshot is saved within SAVE_DELAY_SECONDS
+    def update(self, fn: Callable[[Workspace], T]) -> T:
+        with self.lock.write():
+            result = fn(self.workspace)
+            self._revision += 1
+        self._schedule_save()
+        return result
+
+    def _schedule_save(self):
+        with self._timer_lock:
+            if self._timer is None:
+                self._timer = threading.Timer(SAVE_DELAY_SECONDS, self._scheduled_save)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _scheduled_save(self):
+        with self._timer_lock:
+            self._timer = None
+        self.save()
+
+    # Saves any pending change now (on shutdown)
+    def flush(self):
+        with self._timer_lock:
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+        self.save()
+
+    def save(self):
+        with self.lock.read():
+            revision = self._revision
+            if revision <= self._saved_revision:
+                return
+            payload = self.workspace.dump_snapshot()
+        with self._save_lock:
+            # A slower save of an older revision must not overwrite a newer one
+            if revision > self._saved_revision:
+                atomic_write(self.snapshot_path, payload)
+                self._saved_revision = revision
+
+    # (text, mtime) of the saved style guide, or None when there isn't one.
+    # Read from disk only when the file has changed since the last call.
+    def style_guide(self) -> Optional[Tuple[str, float]]:
+        return self._style_file.read()
+
+    # Returns the saved file's mtime
+    def save_style_guide(self, text: str) -> float:
+        with self._style_lock:
+            atomic_write(self.style_guide_path, text)
+            return self._style_file.read()[1]
+
+
+class TenantRegistry:
+    def __init__(self, tenants_dir: str = TENANTS_DIR):
+        self.tenants_dir = tenants_dir
+        self._tenants: Dict[str, Tenant] = {}
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def flush(self):
+        with self._lock:
+            tenants = list(self._tenants.values())
+        for tenant in tenants:
+            tenant.flush()
+
+    # Loads each tenant's snapshot once; concurrent first requests share it
+    def get(self, name: str) -> Tenant:
+        name = tenant_name(name)
+        tenant = self._tenants.get(name)
+        if tenant is None:
+            with self._lock:
+                tenant = self._tenants.get(name)
+                if tenant is None:
+                    tenant = self._tenants[name] = Tenant(name, self.tenants_dir)
+        return tenant
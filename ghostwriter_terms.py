@@ -0,0 +1,105 @@
+# ghostwriter_terms.py
+
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import re
+from collections import deque
+
+WORD_RE = re.compile(r"\w+")
+
+# Key marking a trie node where a variant ends; never a token since tokens are \w+
+_TERMINAL = ""
+
+
+class TermMatch(NamedTuple):
+    variant: str    # normalized variant, e.g. 'power cord'
+    preferred: str
+    start: int      # character span of the match in the scanned text
+    end: int
+    line: int
+
+
+def normalize_term(term: str) -> str:
+    return " ".join(WORD_RE.findall(term.lower()))
+
+
+# Token trie over every variant phrase. Adding a term only touches the nodes on
+# its own path, so the matcher never needs a full rebuild.
+class TermMatcher:
+    def __init__(self):
+        self._root: Dict = {}
+        self.max_words = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    # Expects a normalized variant (see normalize_term)
+    def __contains__(self, variant: str) -> bool:
+        node = self._root
+        for word in variant.split():
+            node = node.get(word)
+            if node is None:
+                return False
+        return _TERMINAL in node
+
+    def add(self, variant: str, preferred: str) -> str:
+        words = normalize_term(variant).split()
+        if not words:
+            raise ValueError(f"Term has no words: {variant!r}")
+        node = self._root
+        for word in words:
+            node = node.setdefault(word, {})
+        if _TERMINAL not in node:
+            self._count += 1
+        key = " ".join(words)
+        node[_TERMINAL] = (key, preferred)
+        self.max_words = max(self.max_words, len(words))
+        return key
+
+    def stream(self) -> "TermStream":
+        return TermStream(self._root, self.max_words)
+
+
+# Leftmost-longest matching over a token stream. Tokens are held in a window no
+# wider than the longest variant, so each token is looked at O(max_words) times.
+class TermStream:
+    def __init__(self, root: Dict, max_words: int):
+        self._root = root
+        self._max_words = max(max_words, 1)
+        self._window: deque = deque()
+
+    def feed(self, word: str, start: int, end: int, line: int) -> List[TermMatch]:
+        if not self._window and word not in self._root:
+            return []
+        self._window.append((word, start, end, line))
+        matches = []
+        while len(self._window) >= self._max_words:
+            self._step(matches)
+        return matches
+
+    # Call at sentence boundaries and at the end so phrases never span them
+    def flush(self) -> List[TermMatch]:
+        matches = []
+        while self._window:
+            self._step(matches)
+        return matches
+
+    def _step(self, matches: List[TermMatch]):
+        window = self._window
+        node = self._root
+        best = 0
+        terminal: Optional[Tuple[str, str]] = None
+        for i, (word, _, _, _) in enumerate(window):
+            node = node.get(word)
+            if node is None:
+                break
+            if _TERMINAL in node:
+                best = i + 1
+                terminal = node[_TERMINAL]
+        if not best:
+            window.popleft()
+            return
+        first, last = window[0], window[best - 1]
+        matches.append(TermMatch(terminal[0], terminal[1], first[1], last[2], first[3]))
+        for _ in range(best):
+            window.popleft()
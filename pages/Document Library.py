@@ -1,50 +1,109 @@
 import streamlit as st
-import os
-import json
-from datetime import datetime
+import math
+
+from ghostwriter_export import ChatbotExporter
+from ghostwriter_library import (
+    sync_index, count_documents, list_documents, search_documents, load_document, delete_document,
+    list_versions, load_version, similar_documents, iter_documents,
+)
+from ghostwriter_metrics import span
 
 st.set_page_config(page_title="📚 Document Library", layout="wide")
 st.title("📚 Document Library")
 
-DOCS_DIR = "docs"
+PAGE_SIZE_OPTIONS = [10, 25, 50, 100]
+SEARCH_LIMIT = 50
+EXPORT_PATH = ".ghostwriter_cache/export/library.jsonl"
+
+
+def show_document(doc):
+    version = f" · v{doc['version']}" if doc["version"] > 1 else ""
+    with st.expander(f"📄 {doc['name']} ({doc['type']}) – {doc['date']}{version}"):
+        if doc.get("snippet"):
+            st.markdown("> " + doc["snippet"].replace("\n", " "))
+        st.markdown(f"**Audience:** {doc['audience']}")
+        st.markdown(f"**Tags:** {', '.join(doc['tags'])}")
+
+        if st.toggle("Show content", key=f"show_{doc['id']}"):
+            with span("library_load"):
+                full_doc = load_document(doc["id"])
+            if full_doc is None:
+                st.warning("⚠️ This document no longer exists.")
+                return
+            st.code(full_doc['content'], language="markdown")
+            st.download_button("⬇️ Download Markdown", full_doc['content'], file_name=doc['filename'], mime="text/markdown")
+
+        if doc["version"] > 1 and st.toggle("Show version history", key=f"history_{doc['id']}"):
+            versions = list_versions(doc["id"])
+            labels = {v["version"]: f"v{v['version']} – {v['name']} ({v['date']})" for v in versions}
+            selected = st.selectbox("Version", list(labels), format_func=labels.get, key=f"version_{doc['id']}")
+            old_content = load_version(doc["id"], selected)
+            if old_content is not None:
+                st.code(old_content, language="markdown")
+                stem = doc["filename"].rsplit(".", 1)[0]
+                st.download_button(f"⬇️ Download v{selected}", old_content, file_name=f"{stem}-v{selected}.md",
+                                   mime="text/markdown", key=f"download_v_{doc['id']}")
+
+        if st.toggle("Show similar documents", key=f"similar_{doc['id']}"):
+            similar = similar_documents(doc["id"])
+            if not similar:
+                st.caption("No similar documents in the library.")
+            for other in similar:
+                st.markdown(f"- **{other['name']}** ({other['type']}, {other['date']}) – {other['similarity']:.0%} similar")
 
-# Load all JSON files from docs/
-doc_files = [
-    f for f in os.listdir(DOCS_DIR)
-    if f.endswith(".json") and os.path.getsize(os.path.join(DOCS_DIR, f)) > 100
-]
+        confirm_key = f"confirm_{doc['id']}"
+        delete_key = f"delete_{doc['id']}"
 
-# Load and parse all valid documents
-documents = []
+        if st.checkbox(f"⚠️ Yes, I want to delete this document", key=confirm_key):
+            if st.button(f"🗑️ Delete '{doc['name']}'", key=delete_key):
+                delete_document(doc["id"])
+                st.success(f"✅ '{doc['name']}' deleted.")
+                st.rerun()
 
-for filename in doc_files:
-    try:
-        with open(os.path.join(DOCS_DIR, filename), "r") as f:
-            doc = json.load(f)
-            doc["__filename__"] = filename  # stash filename for deletion later
-            documents.append(doc)
-    except Exception as e:
-        st.warning(f"⚠️ Skipping '{filename}': file is invalid or corrupt. ({e})")
 
-# Sort by date/time descending
-documents.sort(key=lambda d: d.get("date", ""), reverse=True)
+# Import JSON files dropped into docs/ (cheap when nothing changed)
+with span("library_sync"):
+    warnings = sync_index()
+for warning in warnings:
+    st.warning(f"⚠️ {warning}")
 
-# Display
+total = count_documents()
+if total == 0:
+    st.info("No documents saved yet.")
+    st.stop()
+
+# Streamed to disk document by document; only the finished file is read back
+with st.expander("🤖 Chatbot Export"):
+    st.caption("Every document as JSONL records, one per heading-scoped chunk. "
+               "For incremental exports, run `python ghostwriter_export.py out.jsonl --manifest manifest.json`.")
+    if st.button("Export Library", key="chatbot_export"):
+        stats = ChatbotExporter().export_file(iter_documents(), EXPORT_PATH)
+        st.caption(f"{stats.upserts} chunks from {stats.documents} documents.")
+        with open(EXPORT_PATH, "rb") as f:
+            st.download_button("⬇️ Download JSONL", f, file_name="library.jsonl", mime="application/jsonl")
+
+query = st.text_input("🔎 Search", placeholder="Search names, types, audiences, tags and content", key="library_query")
+
+if query.strip():
+    with span("library_search"):
+        results = search_documents(query, limit=SEARCH_LIMIT)
+    st.caption(f"{len(results)} matching documents" + (f" (top {SEARCH_LIMIT})" if len(results) == SEARCH_LIMIT else ""))
+    for doc in results:
+        show_document(doc)
+    st.stop()
+
+# Pagination
+nav_col1, nav_col2, nav_col3 = st.columns([1, 1, 3])
+with nav_col1:
+    page_size = st.selectbox("Per page", PAGE_SIZE_OPTIONS, key="library_page_size")
+page_count = math.ceil(total / page_size)
+with nav_col2:
+    page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1, key="library_page")
+with nav_col3:
+    st.caption(f"{total} documents – page {page} of {page_count}")
+
+# Display (metadata only; bodies are loaded on demand)
+with span("library_list"):
+    documents = list_documents(limit=page_size, offset=(page - 1) * page_size)
 for doc in documents:
-    with st.expander(f"📄 {doc['name']} ({doc['type']}) – {doc['date']}"):
-        st.markdown(f"**Audience:** {doc['audience']}")
-        st.markdown(f"**Tags:** {', '.join(doc.get('tags', []))}")
-        st.code(doc['content'], language="markdown")
-
-        col1, col2 = st.columns(2)
-        with col1:
-            st.download_button("⬇️ Download Markdown", doc['content'], file_name=doc['filename'], mime="text/markdown")
-        with col2:
-            confirm_key = f"confirm_{doc['__filename__']}"
-            delete_key = f"delete_{doc['__filename__']}"
-
-            if st.checkbox(f"⚠️ Yes, I want to delete this document", key=confirm_key):
-                if st.button(f"🗑️ Delete '{doc['name']}'", key=delete_key):
-                    os.remove(os.path.join(DOCS_DIR, doc['__filename__']))
-                    st.success(f"✅ '{doc['name']}' deleted.")
-                    st.rerun()
+    show_document(doc)
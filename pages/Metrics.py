@@ -0,0 +1,72 @@
+import streamlit as st
+import json
+from datetime import datetime
+
+from ghostwriter_metrics import REGISTRY
+
+st.set_page_config(page_title="📈 Metrics", layout="wide")
+st.title("📈 Metrics")
+
+metrics = REGISTRY.as_dict()
+st.caption(f"Collected in this server process since {datetime.fromtimestamp(metrics['started']).strftime('%Y-%m-%d %H:%M:%S')}")
+
+if not metrics["histograms"] and not metrics["counters"]:
+    st.info("Nothing recorded yet – generate, review or open the library first.")
+    st.stop()
+
+
+def series_name(entry) -> str:
+    labels = ", ".join(f"{k}={v}" for k, v in entry["labels"].items())
+    return f"{entry['name']}{{{labels}}}" if labels else entry["name"]
+
+
+def format_value(name: str, value):
+    if value is None:
+        return "–"
+    if name.endswith("_seconds"):
+        return f"{value * 1000:.1f} ms"
+    return f"{value:g}"
+
+
+# Latency and token histograms (percentiles are bucket upper bounds)
+st.subheader("⏱️ Timings and sizes")
+st.dataframe(
+    [
+        {
+            "metric": series_name(h),
+            "count": h["count"],
+            "mean": format_value(h["name"], h["sum"] / h["count"] if h["count"] else None),
+            "p50 ≤": format_value(h["name"], h["p50"]),
+            "p95 ≤": format_value(h["name"], h["p95"]),
+            "p99 ≤": format_value(h["name"], h["p99"]),
+        }
+        for h in metrics["histograms"]
+    ],
+    use_container_width=True,
+    hide_index=True,
+)
+
+histograms = {series_name(h): h for h in metrics["histograms"]}
+if histograms:
+    selected = st.selectbox("Distribution", list(histograms))
+    buckets = histograms[selected]["buckets"]
+    st.bar_chart({"bucket": [f"≤ {bound}" for bound in buckets], "count": list(buckets.values())}, x="bucket", y="count")
+
+if metrics["counters"]:
+    st.subheader("🔢 Counters")
+    st.dataframe(
+        [{"metric": series_name(c), "value": c["value"]} for c in metrics["counters"]],
+        use_container_width=True,
+        hide_index=True,
+    )
+
+st.subheader("📤 Export")
+col1, col2, col3 = st.columns(3)
+with col1:
+    st.download_button("⬇️ Prometheus text", REGISTRY.as_prometheus(), file_name="ghostwriter.prom", mime="text/plain")
+with col2:
+    st.download_button("⬇️ JSON", json.dumps(metrics, indent=2), file_name="ghostwriter_metrics.json", mime="application/json")
+with col3:
+    if st.button("🧹 Reset metrics"):
+        REGISTRY.reset()
+        st.rerun()
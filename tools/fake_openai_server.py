@@ -0,0 +1,145 @@
+# tools/fake_openai_server.py
+#
+# Minimal OpenAI-compatible chat completions server for local development.
+# Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8001/v1
+#
+#   python tools/fake_openai_server.py --port 8001 --first-token-delay 0.5 --token-delay 0.02
+
+import re
+import json
+import time
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DRAFT_TEMPLATE = """# {doc_type}
+
+## Overview
+
+This is a placeholder draft produced by the fake OpenAI server.
+
+## Steps
+
+1. Unpack the device.
+2. Connect the power cable.
+3. Press the power button.
+
+## Troubleshooting
+
+- If the device does not start, check the power cable.
+"""
+
+
+# Section rewrites (see ghostwriter_sections) get each marked section back
+# with its heading and a placeholder body
+SECTION_RE = re.compile(r"^<!-- section (\d+) -->\n(.*)$", re.M)
+
+
+def _sections_for(content):
+    return "\n\n".join(
+        f"<!-- section {number} -->\n{heading}\n\nThis section was rewritten by the fake OpenAI server."
+        for number, heading in SECTION_RE.findall(content)
+    )
+
+
+def _draft_for(messages):
+    doc_type = "Document"
+    for message in messages:
+        content = message.get("content", "")
+        if message.get("role") == "user" and SECTION_RE.search(content):
+            return _sections_for(content)
+        for line in content.splitlines():
+            if line.startswith("DOCUMENT TYPE:"):
+                doc_type = line.split(":", 1)[1].strip()
+    return DRAFT_TEMPLATE.format(doc_type=doc_type)
+
+
+def _tokens(text):
+    # Word-ish pieces with their trailing whitespace, like a real token stream
+    piece = ""
+    for ch in text:
+        piece += ch
+        if ch.isspace():
+            yield piece
+            piece = ""
+    if piece:
+        yield piece
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    first_token_delay = 0.0
+    token_delay = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        draft = _draft_for(body.get("messages", []))
+        model = body.get("model", "fake-model")
+        created = int(time.time())
+
+        time.sleep(self.first_token_delay)
+        if not body.get("stream"):
+            payload = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": draft}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(draft.split()), "total_tokens": len(draft.split())},
+            }
+            data = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            for token in _tokens(draft):
+                self._send_chunk(model, created, {"content": token}, None)
+                time.sleep(self.token_delay)
+            self._send_chunk(model, created, {}, "stop")
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # Client cancelled the stream
+            pass
+
+    def _send_chunk(self, model, created, delta, finish_reason):
+        chunk = {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.wfile.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--first-token-delay", type=float, default=0.0, help="seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="seconds between streamed tokens")
+    args = parser.parse_args()
+
+    FakeOpenAIHandler.first_token_delay = args.first_token_delay
+    FakeOpenAIHandler.token_delay = args.token_delay
+    server = ThreadingHTTPServer((args.host, args.port), FakeOpenAIHandler)
+    print(f"Fake OpenAI server listening on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()